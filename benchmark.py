@@ -0,0 +1,214 @@
+from PIL import Image
+import numpy as np
+import argparse
+import json
+import os
+import platform
+import string
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import stego
+
+DEFAULT_MEGAPIXELS = (0.1, 1, 10)   # add 50/100 with --megapixels for the full sweep
+DEFAULT_MODES = ("RGB", "RGBA", "P", "L")
+DEFAULT_PAYLOADS = (10, 1000, 100_000)
+NEAR_CAPACITY = 0.9  # fraction of capacity used for the "near capacity" payload
+REGRESSION_THRESHOLD = 0.15
+RSS_CHILD = """
+import json, sys
+import stego
+op, args = json.load(sys.stdin)
+if op:
+    getattr(stego, op)(*args)
+print(stego._peak_rss())
+"""
+
+# ------------------ Synthetic Carriers ------------------
+
+def make_carrier(megapixels: float, mode: str, directory: str) -> str:
+    """Create (or reuse) a deterministic synthetic carrier PNG and return its path"""
+    path = os.path.join(directory, f"carrier_{megapixels:g}mp_{mode}.png")
+    if os.path.exists(path):
+        return path
+
+    width = int(round((megapixels * 1e6 * 4 / 3) ** 0.5))
+    height = int(round(megapixels * 1e6 / width))
+    rng = np.random.default_rng(int(megapixels * 1000))
+    # Smooth gradients plus noise compress like photos rather than like pure noise
+    y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+    base = np.stack([x / width, y / height, (x + y) / (width + height)], axis=-1) * 200
+    noise = rng.normal(0, 12, size=(height, width, 3)).astype(np.float32)
+    rgb = np.clip(base + noise, 0, 255).astype(np.uint8)
+
+    img = Image.fromarray(rgb, 'RGB')
+    if mode == "RGBA":
+        img.putalpha(255)
+    elif mode == "P":
+        img = img.quantize(256)
+    elif mode == "L":
+        img = img.convert('L')
+    img.save(path, compress_level=1)
+    return path
+
+def make_payload(size: int) -> str:
+    """Deterministic ASCII text payload of exactly `size` bytes"""
+    alphabet = np.frombuffer((string.ascii_letters + string.digits + " ").encode('ascii'), dtype=np.uint8)
+    rng = np.random.default_rng(size)
+    return rng.choice(alphabet, size).tobytes().decode('ascii')
+
+# ------------------ Measurement ------------------
+
+def measure(func, repeat: int):
+    """Best wall time over `repeat` untraced runs, then peak traced memory of one more"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        func()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return best, peak, result
+
+def peak_rss(op: str = None, *args):
+    """Peak RSS in bytes of one stego.<op>(*args) call in a fresh interpreter, or None if unknown
+
+    tracemalloc only sees Python allocations, not Pillow's or NumPy's C buffers,
+    so this is the number to size machines by. With no `op` it measures the
+    interpreter with stego imported, the floor every case includes.
+    """
+    if stego.resource is None:
+        return None
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(
+        filter(None, [os.path.dirname(os.path.abspath(stego.__file__)), os.environ.get("PYTHONPATH")])))
+    child = subprocess.run([sys.executable, "-c", RSS_CHILD], input=json.dumps([op, args]), text=True,
+                           capture_output=True, env=env, check=True)
+    return int(child.stdout)
+
+def run_suite(megapixels, modes, payloads, repeat: int, workdir: str) -> list:
+    """Run hide/extract over every carrier and payload size; return result records"""
+    records = []
+    for mp in megapixels:
+        for mode in modes:
+            carrier = make_carrier(mp, mode, workdir)
+            width, height = Image.open(carrier).size
+            cap = stego.capacity(carrier)
+            sizes = sorted({s for s in payloads if s <= cap} | {int(cap * NEAR_CAPACITY)})
+            for size in sizes:
+                message = make_payload(size)
+                output = os.path.join(workdir, "stego_out.png")
+                seconds, peak, result = measure(lambda: stego.hide_message(carrier, output, message), repeat)
+                if result.startswith("Error:"):
+                    raise RuntimeError(f"hide failed on {carrier}: {result}")
+                records.append(_record("hide", mode, width, height, size, seconds, peak,
+                                       peak_rss("hide_message", carrier, output, message)))
+
+                seconds, peak, result = measure(lambda: stego.extract_message(output), repeat)
+                if result != "Hidden message: " + message:
+                    raise RuntimeError(f"extract mismatch on {carrier} with {size} B")
+                records.append(_record("extract", mode, width, height, size, seconds, peak,
+                                       peak_rss("extract_message", output)))
+                print(f"{mp:>6g} MP {mode:<4} {size:>10} B  hide {records[-2]['seconds']:.4f}s  "
+                      f"extract {records[-1]['seconds']:.4f}s", file=sys.stderr)
+    return records
+
+def _record(op, mode, width, height, payload, seconds, peak, rss) -> dict:
+    return {
+        "op": op, "mode": mode, "width": width, "height": height,
+        "megapixels": round(width * height / 1e6, 3), "payload_bytes": payload,
+        "seconds": round(seconds, 6),
+        "payload_mb_s": round(payload / 1e6 / seconds, 6) if seconds else None,
+        "pixels_s": round(width * height / seconds) if seconds else None,
+        "peak_traced_bytes": peak,  # Python heap only: Pillow/NumPy pixel buffers are not traced
+        "peak_rss_bytes": rss,
+    }
+
+# ------------------ Comparison ------------------
+
+def _key(record: dict) -> tuple:
+    return record["op"], record["mode"], record["width"], record["height"], record["payload_bytes"]
+
+def compare(baseline: dict, current: dict, threshold: float = REGRESSION_THRESHOLD) -> list:
+    """Return (record, baseline_seconds, ratio) for cases slower than baseline by > threshold"""
+    base = {_key(r): r for r in baseline["results"]}
+    regressions = []
+    for record in current["results"]:
+        old = base.get(_key(record))
+        if old and old["seconds"] > 0:
+            ratio = record["seconds"] / old["seconds"]
+            if ratio > 1 + threshold:
+                regressions.append((record, old["seconds"], ratio))
+    return regressions
+
+# ------------------ Command Line ------------------
+
+def _floats(text: str) -> list:
+    return [float(v) for v in text.split(",") if v]
+
+def _ints(text: str) -> list:
+    return [int(v) for v in text.split(",") if v]
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Throughput benchmarks for stego embed/extract.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="run the benchmark suite")
+    run.add_argument("--megapixels", type=_floats, default=list(DEFAULT_MEGAPIXELS),
+                     help="comma-separated carrier sizes, e.g. 0.1,1,10,100")
+    run.add_argument("--modes", default=",".join(DEFAULT_MODES), help="comma-separated image modes")
+    run.add_argument("--payloads", type=_ints, default=list(DEFAULT_PAYLOADS),
+                     help="comma-separated payload sizes in bytes (near-capacity is always added)")
+    run.add_argument("--repeat", type=int, default=3, help="timed runs per case; best is kept")
+    run.add_argument("--workdir", help="where carriers are cached (default: a temp dir)")
+    run.add_argument("--out", default="benchmark.json", help="results file")
+    run.add_argument("--cache-mb", type=int, default=0,
+                     help="enable the decode cache with this budget; repeats then skip decode (default: off)")
+
+    cmp_ = commands.add_parser("compare", help="flag regressions against a saved baseline")
+    cmp_.add_argument("baseline")
+    cmp_.add_argument("current")
+    cmp_.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD,
+                      help="allowed slowdown as a fraction (default 0.15)")
+
+    args = parser.parse_args(argv)
+    if args.command == "run":
+        workdir = args.workdir or tempfile.mkdtemp(prefix="stego_bench_")
+        os.makedirs(workdir, exist_ok=True)
+        if args.cache_mb > 0:
+            stego.enable_decode_cache(args.cache_mb << 20)
+        records = run_suite(args.megapixels, args.modes.split(","), args.payloads, args.repeat, workdir)
+        report = {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(), "numpy": np.__version__,
+            "pillow": Image.__version__, "machine": platform.machine(),
+            "decode_cache": stego.decode_cache_stats(),
+            "baseline_rss_bytes": peak_rss(),
+            "results": records,
+        }
+        with open(args.out, "w", encoding='utf-8') as fp:
+            json.dump(report, fp, indent=2)
+        print(f"Wrote {len(records)} results to {args.out}", file=sys.stderr)
+        return 0
+
+    with open(args.baseline, encoding='utf-8') as fp:
+        baseline = json.load(fp)
+    with open(args.current, encoding='utf-8') as fp:
+        current = json.load(fp)
+    regressions = compare(baseline, current, args.threshold)
+    for record, old, ratio in regressions:
+        print(f"REGRESSION {record['op']:<7} {record['mode']:<4} {record['megapixels']:>7g} MP "
+              f"{record['payload_bytes']:>10} B  {old:.4f}s -> {record['seconds']:.4f}s ({ratio:.2f}x)")
+    if not regressions:
+        print("No regressions.")
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,7 +1,10 @@
 import tkinter as tk
-from tkinter import filedialog, messagebox
+from tkinter import filedialog, messagebox, ttk
 import math
+import os
+import queue
 import random
+import threading
 import time
 
 # ============== COLOR PALETTE ==============
@@ -16,6 +19,69 @@ ACCENT_YELLOW = "#FFB703"
 FG_COLOR = "#FFFFFF"
 TXT_BG = "#0F1B3C"
 
+CAPACITY_DEBOUNCE_MS = 250
+
+# ============== ANIMATION SCHEDULER ==============
+FRAME_RATE = 30          # frame budget: ticks per second
+IDLE_CHECK_MS = 250      # how often a paused scheduler checks whether to resume
+REDUCED_MOTION = os.environ.get("STEGO_REDUCED_MOTION", "") not in ("", "0")
+
+class AnimationScheduler:
+    """Drive every animated widget from a single ``after`` ticker.
+    
+    Widgets register themselves and receive ``step(frames)`` calls, where
+    ``frames`` is the elapsed time in units of their original 30 ms frame.
+    Ticking pauses while the window is unfocused or minimized.
+    """
+    def __init__(self, root, fps=FRAME_RATE, reduced_motion=REDUCED_MOTION):
+        self.root = root
+        self.interval = max(1, int(1000 / fps))
+        self.reduced_motion = reduced_motion
+        self.widgets = []
+        self.last = time.perf_counter()
+        root.animation_scheduler = self
+        root.after(self.interval, self.tick)
+    
+    @staticmethod
+    def for_widget(widget):
+        root = widget.winfo_toplevel()
+        scheduler = getattr(root, "animation_scheduler", None)
+        if scheduler is None:
+            scheduler = AnimationScheduler(root)
+        return scheduler
+    
+    def register(self, widget):
+        self.widgets.append(widget)
+    
+    def unregister(self, widget):
+        if widget in self.widgets:
+            self.widgets.remove(widget)
+    
+    def is_paused(self):
+        try:
+            return self.root.state() == "iconic" or self.root.focus_displayof() is None
+        except tk.TclError:
+            return True
+    
+    def tick(self):
+        now = time.perf_counter()
+        if self.is_paused():
+            self.last = now
+            self.root.after(IDLE_CHECK_MS, self.tick)
+            return
+        
+        # Clamp so a long stall does not make everything jump
+        frames = min((now - self.last) * 1000 / 30, 4.0)
+        self.last = now
+        for widget in list(self.widgets):
+            if widget.winfo_exists():
+                widget.step(frames)
+            else:
+                self.unregister(widget)
+        
+        elapsed = int((time.perf_counter() - now) * 1000)
+        self.root.after(max(1, self.interval - elapsed), self.tick)
+
 # ============== ANIMATED PARTICLE BACKGROUND ==============
 class ParticleCanvas(tk.Canvas):
     def __init__(self, parent, **kwargs):
@@ -26,7 +92,8 @@ class ParticleCanvas(tk.Canvas):
         self.setup_particles()
         self.setup_orbs()
         self.time = 0
-        self.animate()
+        self.scheduler = AnimationScheduler.for_widget(self)
+        self.scheduler.register(self)
     
     def setup_particles(self):
         w = self.winfo_width()
@@ -46,7 +113,9 @@ class ParticleCanvas(tk.Canvas):
             self.particles.append({
                 'x': x, 'y': y, 'vx': vx, 'vy': vy,
                 'size': size, 'color': color, 'opacity': opacity,
-                'id': None, 'max_opacity': opacity, 'angle': random.uniform(0, 2*math.pi)
+                'max_opacity': opacity, 'angle': random.uniform(0, 2*math.pi),
+                'id': self.create_oval(x - size, y - size, x + size, y + size,
+                                       fill=color, outline="", tags="particle")
             })
     
     def setup_orbs(self):
@@ -57,64 +126,56 @@ class ParticleCanvas(tk.Canvas):
             return
         
         for _ in range(3):
+            color = random.choice([ACCENT_CYAN, ACCENT_PURPLE, ACCENT_PINK])
             self.orbs.append({
                 'x': random.randint(100, w-100),
                 'y': random.randint(100, h-100),
                 'radius': random.randint(30, 80),
-                'color': random.choice([ACCENT_CYAN, ACCENT_PURPLE, ACCENT_PINK]),
-                'pulse': random.uniform(0, 2*math.pi)
+                'color': color,
+                'pulse': random.uniform(0, 2*math.pi),
+                # Outer ring and inner glow, created once and moved every frame
+                'outer': self.create_oval(0, 0, 0, 0, outline=color, width=2, tags="orb"),
+                'inner': self.create_oval(0, 0, 0, 0, outline=color, width=1, tags="orb")
             })
+        self.place_orbs()
     
-    def animate(self):
+    def place_orbs(self):
+        for orb in self.orbs:
+            pulse_size = orb['radius'] + math.sin(self.time + orb['pulse']) * 20
+            self.coords(orb['outer'],
+                        orb['x'] - pulse_size, orb['y'] - pulse_size,
+                        orb['x'] + pulse_size, orb['y'] + pulse_size)
+            self.coords(orb['inner'],
+                        orb['x'] - pulse_size*0.6, orb['y'] - pulse_size*0.6,
+                        orb['x'] + pulse_size*0.6, orb['y'] + pulse_size*0.6)
+    
+    def step(self, frames):
+        if self.scheduler.reduced_motion or not (self.particles or self.orbs):
+            return
+        
         w = self.winfo_width()
         h = self.winfo_height()
         
-        self.delete("particle", "orb")
-        
-        self.time += 0.02
+        self.time += 0.02 * frames
+        self.place_orbs()
         
-        # Draw pulsing orbs
-        for orb in self.orbs:
-            pulse_size = orb['radius'] + math.sin(self.time + orb['pulse']) * 20
-            alpha = int(50 + 50 * math.sin(self.time + orb['pulse']))
-            
-            self.create_oval(
-                orb['x'] - pulse_size, orb['y'] - pulse_size,
-                orb['x'] + pulse_size, orb['y'] + pulse_size,
-                outline=orb['color'], width=2, tags="orb"
-            )
-            
-            # Inner glow
-            self.create_oval(
-                orb['x'] - pulse_size*0.6, orb['y'] - pulse_size*0.6,
-                orb['x'] + pulse_size*0.6, orb['y'] + pulse_size*0.6,
-                outline=orb['color'], width=1, tags="orb"
-            )
-        
-        # Animate particles
+        # Move particles
         for p in self.particles:
-            p['x'] += p['vx']
-            p['y'] += p['vy']
-            p['vy'] += 0.05
-            p['angle'] += 0.1
+            p['x'] += p['vx'] * frames
+            p['y'] += p['vy'] * frames
+            p['vy'] += 0.05 * frames
+            p['angle'] += 0.1 * frames
             
             if p['x'] < 0 or p['x'] > w or p['y'] > h:
                 p['x'] = random.randint(0, w)
                 p['y'] = -10
                 p['opacity'] = p['max_opacity']
             
-            p['opacity'] = max(0, p['opacity'] - 0.5)
+            p['opacity'] = max(0, p['opacity'] - 0.5 * frames)
             
-            try:
-                self.create_oval(
-                    p['x'] - p['size'], p['y'] - p['size'],
-                    p['x'] + p['size'], p['y'] + p['size'],
-                    fill=p['color'], outline="", tags="particle"
-                )
-            except:
-                pass
-        
-        self.after(30, self.animate)
+            self.coords(p['id'],
+                        p['x'] - p['size'], p['y'] - p['size'],
+                        p['x'] + p['size'], p['y'] + p['size'])
 
 # ============== WAVE ANIMATION ==============
 class WaveCanvas(tk.Canvas):
@@ -122,20 +183,32 @@ class WaveCanvas(tk.Canvas):
         super().__init__(parent, **kwargs)
         self.config(bg=BG_DARK, highlightthickness=0)
         self.time = 0
-        self.animate()
+        self.segments = []
+        self.drawn_size = None
+        self.scheduler = AnimationScheduler.for_widget(self)
+        self.scheduler.register(self)
     
-    def animate(self):
-        self.delete("wave")
-        self.time += 0.05
-        
+    def step(self, frames):
         w = self.winfo_width()
         h = self.winfo_height()
+        size = (w, h)
+        if self.scheduler.reduced_motion and size == self.drawn_size:
+            return
         
-        for i in range(0, w, 20):
-            y = h // 2 + int(20 * math.sin(i * 0.02 + self.time)) + int(10 * math.cos(self.time * 0.5))
-            self.create_line(i, y, i+10, y, fill=ACCENT_CYAN, width=2, tags="wave")
+        # Segment pool only changes when the canvas is resized
+        count = len(range(0, w, 20))
+        while len(self.segments) < count:
+            self.segments.append(self.create_line(0, 0, 0, 0, fill=ACCENT_CYAN, width=2, tags="wave"))
+        while len(self.segments) > count:
+            self.delete(self.segments.pop())
+        self.drawn_size = size
         
-        self.after(50, self.animate)
+        # Original ticked every 50 ms; frames are 30 ms units
+        if not self.scheduler.reduced_motion:
+            self.time += 0.05 * frames * 30 / 50
+        for i, segment in zip(range(0, w, 20), self.segments):
+            y = h // 2 + int(20 * math.sin(i * 0.02 + self.time)) + int(10 * math.cos(self.time * 0.5))
+            self.coords(segment, i, y, i+10, y)
 
 # ============== GLOWING BUTTON WITH MEGA ANIMATIONS ==============
 class SuperGlowingButton(tk.Canvas):
@@ -150,79 +223,87 @@ class SuperGlowingButton(tk.Canvas):
         self.clicked = False
         self.click_time = 0
         self.particles = []
+        self.drawn_state = None
         
         self.bind("<Button-1>", self.on_click)
         self.bind("<Enter>", self.on_hover)
         self.bind("<Leave>", self.on_leave)
         
+        self.scheduler = AnimationScheduler.for_widget(self)
+        self.scheduler.register(self)
+        self.build()
         self.draw()
-        self.animate()
+    
+    def build(self):
+        """Create every canvas item once; draw() only reconfigures them"""
+        # Multiple glow layers
+        self.glow_layers = [
+            self.create_oval(15 - i*3, 10 - i*2.5, 235 + i*3, 60 + i*2.5, fill="")
+            for i in range(5, 0, -1)
+        ]
+        
+        # Main button with gradient effect
+        self.body = self.create_rectangle(15, 10, 235, 60, width=3)
+        
+        # Text with shadow and glow
+        shadow_offset = 2
+        self.create_text(125 + shadow_offset, 35 + shadow_offset, text=self.text,
+                        font=("Arial", 12, "bold"), fill="#000000", tags="shadow")
+        self.create_text(125, 35, text=self.text, font=("Arial", 12, "bold"),
+                        fill=FG_COLOR, tags="text")
     
     def spawn_particles(self):
         """Create explosion particles on click"""
         for _ in range(12):
             angle = random.uniform(0, 2*math.pi)
             speed = random.uniform(2, 5)
+            color = random.choice([self.base_color, ACCENT_PINK])
+            item = self.create_oval(122, 32, 128, 38, fill=color, outline="", tags="particle")
+            self.tag_lower(item, "shadow")
             self.particles.append({
                 'x': 125, 'y': 35,
                 'vx': math.cos(angle) * speed,
                 'vy': math.sin(angle) * speed,
                 'life': 1.0,
-                'color': random.choice([self.base_color, ACCENT_PINK])
+                'color': color,
+                'id': item
             })
     
-    def draw(self):
-        self.delete("all")
-        
+    def glow_state(self):
         # Calculate glow intensity
         if self.clicked:
-            glow_intensity = 4
-            color = ACCENT_PINK
-            scale = 1.1
-        elif self.is_hovered:
-            glow_intensity = 3 + int(math.sin(self.pulse) * 1.5)
-            color = ACCENT_PINK
-            scale = 1.05
-        else:
-            glow_intensity = 1 + int(math.sin(self.pulse) * 1)
-            color = self.base_color
-            scale = 1.0
+            return ACCENT_PINK, 4
+        if self.is_hovered:
+            pulse = 0 if self.scheduler.reduced_motion else math.sin(self.pulse)
+            return ACCENT_PINK, 3 + int(pulse * 1.5)
+        pulse = 0 if self.scheduler.reduced_motion else math.sin(self.pulse)
+        return self.base_color, 1 + int(pulse * 1)
+    
+    def draw(self, frames=1.0):
+        state = self.glow_state()
+        if state != self.drawn_state:
+            color, glow_intensity = state
+            for i, layer in zip(range(5, 0, -1), self.glow_layers):
+                self.itemconfig(layer, outline=color, width=max(1, glow_intensity - i + 1))
+            self.itemconfig(self.body, fill=color, outline=color)
+            self.drawn_state = state
         
-        # Draw multiple glow layers
-        for i in range(5, 0, -1):
-            alpha_factor = (5 - i) / 5
-            self.create_oval(
-                15 - i*3, 10 - i*2.5, 235 + i*3, 60 + i*2.5,
-                outline=color, width=max(1, glow_intensity - i + 1),
-                fill=""
-            )
-        
-        # Main button with gradient effect
-        self.create_rectangle(15, 10, 235, 60, fill=color, outline=color, width=3)
-        
-        # Draw particles
+        # Move particles
         for p in self.particles:
-            p['x'] += p['vx']
-            p['y'] += p['vy']
-            p['vy'] += 0.2
-            p['life'] -= 0.08
+            p['x'] += p['vx'] * frames
+            p['y'] += p['vy'] * frames
+            p['vy'] += 0.2 * frames
+            p['life'] -= 0.08 * frames
             
             if p['life'] > 0:
                 size = 3 * p['life']
-                self.create_oval(
-                    p['x'] - size, p['y'] - size,
-                    p['x'] + size, p['y'] + size,
-                    fill=p['color'], outline="", tags="particle"
-                )
+                self.coords(p['id'],
+                            p['x'] - size, p['y'] - size,
+                            p['x'] + size, p['y'] + size)
+            else:
+                self.delete(p['id'])
         
         self.particles = [p for p in self.particles if p['life'] > 0]
-        
-        # Text with shadow and glow
-        shadow_offset = 2
-        self.create_text(125 + shadow_offset, 35 + shadow_offset, text=self.text,
-                        font=("Arial", 12, "bold"), fill="#000000", tags="shadow")
-        self.create_text(125, 35, text=self.text, font=("Arial", 12, "bold"),
-                        fill=FG_COLOR, tags="text")
     
     def on_hover(self, e):
         self.is_hovered = True
@@ -238,10 +319,11 @@ class SuperGlowingButton(tk.Canvas):
         self.after(150, lambda: setattr(self, 'clicked', False))
         self.command()
     
-    def animate(self):
-        self.pulse += 0.1
-        self.draw()
-        self.after(30, self.animate)
+    def step(self, frames):
+        self.pulse += 0.1 * frames
+        # Idle buttons whose glow has not changed skip the frame entirely
+        if self.particles or self.glow_state() != self.drawn_state:
+            self.draw(frames)
 
 # ============== ANIMATED LABEL WITH GLOW ==============
 class AnimatedGlowLabel(tk.Label):
@@ -250,13 +332,23 @@ class AnimatedGlowLabel(tk.Label):
         self.original_text = text
         self.char_index = 0
         self.glow_intensity = 0
-        self.animate_text()
-    
-    def animate_text(self):
-        if self.char_index <= len(self.original_text):
-            self.config(text=self.original_text[:self.char_index])
-            self.char_index += 1
-            self.after(40, self.animate_text)
+        self.elapsed = 0
+        self.scheduler = AnimationScheduler.for_widget(self)
+        self.scheduler.register(self)
+        self.step(0)
+    
+    def step(self, frames):
+        if self.scheduler.reduced_motion:
+            self.char_index = len(self.original_text) + 1
+        else:
+            # One character per 40 ms
+            self.elapsed += frames * 30
+            while self.elapsed >= 40 and self.char_index <= len(self.original_text):
+                self.elapsed -= 40
+                self.char_index += 1
+        self.config(text=self.original_text[:self.char_index])
+        if self.char_index > len(self.original_text):
+            self.scheduler.unregister(self)
 
 # ============== GLOWING ENTRY WITH ANIMATIONS ==============
 class AdvancedEntry(tk.Entry):
@@ -312,8 +404,66 @@ class AnimatedText(tk.Text):
     def on_focus_out(self, e):
         self.config(bg=TXT_BG, highlightbackground=TXT_BG)
 
+# ============== BACKGROUND WORKER ==============
+class StegoWorker:
+    """Run stego jobs one at a time on a background thread.
+
+    The worker never touches Tk: it posts events to a queue that the main
+    thread drains with ``root.after``, so animations keep running while a
+    job is busy and further jobs wait their turn.
+    """
+    def __init__(self, root, on_progress, on_finish):
+        self.root = root
+        self.on_progress = on_progress
+        self.on_finish = on_finish
+        self.jobs = queue.Queue()
+        self.events = queue.Queue()
+        self.cancel_event = threading.Event()
+        self.pending = 0
+        threading.Thread(target=self.run, daemon=True).start()
+        self.poll()
+    
+    def submit(self, label, func, *args, **kwargs):
+        self.pending += 1
+        self.jobs.put((label, func, args, kwargs))
+    
+    def cancel(self):
+        self.cancel_event.set()
+    
+    def run(self):
+        while True:
+            label, func, args, kwargs = self.jobs.get()
+            from stego import OperationCancelled  # jobs only exist once stego imported
+            self.cancel_event.clear()
+            
+            def progress(fraction, stage):
+                if self.cancel_event.is_set():
+                    raise OperationCancelled()
+                self.events.put(("progress", label, (fraction, stage)))
+            
+            try:
+                event = ("done", label, func(*args, progress=progress, **kwargs))
+            except OperationCancelled:
+                event = ("cancelled", label, None)
+            except Exception as e:
+                event = ("error", label, str(e))
+            self.events.put(event)
+    
+    def poll(self):
+        while True:
+            try:
+                kind, label, value = self.events.get_nowait()
+            except queue.Empty:
+                break
+            if kind == "progress":
+                self.on_progress(label, *value)
+            else:
+                self.pending -= 1
+                self.on_finish(kind, label, value)
+        self.root.after(50, self.poll)
+
 # ============== MAIN WINDOW ==============
-def create_main_window():
+def create_main_window(fps=FRAME_RATE, reduced_motion=REDUCED_MOTION):
     root = tk.Tk()
     root.title("⚡ STEGANOGRAPHY MASTER ⚡")
     root.geometry("1400x900")
@@ -331,6 +481,9 @@ def create_main_window():
     
     root.bind("<F11>", toggle_fullscreen)
     
+    # One ticker drives every animated widget below
+    AnimationScheduler(root, fps=fps, reduced_motion=reduced_motion)
+    
     # ============== ANIMATED PARTICLE BACKGROUND ==============
     bg_canvas = ParticleCanvas(root, width=1400, height=900)
     bg_canvas.place(x=0, y=0, relwidth=1, relheight=1)
@@ -399,6 +552,7 @@ def create_main_window():
         if path:
             img_entry.delete(0, tk.END)
             img_entry.insert(0, path)
+            schedule_capacity()
     
     tk.Button(left_panel, text="🔍 BROWSE IMAGE", command=browse_image,
              bg=ACCENT_GREEN, fg=FG_COLOR, font=("Arial", 10, "bold"),
@@ -434,12 +588,89 @@ def create_main_window():
     message_title.pack(anchor="w", pady=(0, 15))
     
     msg_text = AnimatedText(right_panel, height=15, width=45)
-    msg_text.pack(fill="both", expand=True, pady=(0, 20))
+    msg_text.pack(fill="both", expand=True, pady=(0, 5))
+    
+    # Live "used / available" meter; capacity comes from the image header only
+    capacity_label = tk.Label(right_panel, text="📏 Capacity: select an image", bg=BG_DARK,
+                              fg=ACCENT_CYAN, font=("Arial", 10, "bold"))
+    capacity_label.pack(anchor="e", pady=(0, 15))
+    capacity_cache = {}
+    capacity_job = [None]
+    
+    def update_capacity():
+        capacity_job[0] = None
+        path = img_entry.get()
+        used = len(msg_text.get("1.0", tk.END).strip().encode("utf-8"))
+        try:
+            from stego import capacity
+            key = (path, os.path.getmtime(path))
+            if key not in capacity_cache:
+                capacity_cache[key] = capacity(path)
+            available = capacity_cache[key]
+        except ImportError:
+            return
+        except Exception:
+            capacity_label.config(text=f"📏 {used:,} B used / no readable image", fg=ACCENT_PURPLE)
+            return
+        capacity_label.config(text=f"📏 {used:,} B used / {available:,} B available",
+                              fg=ACCENT_PINK if used > available else ACCENT_CYAN)
+    
+    def schedule_capacity(e=None):
+        # Debounce: only recompute once typing pauses
+        if capacity_job[0] is not None:
+            root.after_cancel(capacity_job[0])
+        capacity_job[0] = root.after(CAPACITY_DEBOUNCE_MS, update_capacity)
+    
+    msg_text.bind("<KeyRelease>", schedule_capacity, add="+")
+    img_entry.bind("<KeyRelease>", schedule_capacity, add="+")
     
     # ============== BUTTON FRAME ==============
     btn_frame = tk.Frame(main_frame, bg=BG_DARK)
     btn_frame.pack(pady=20)
     
+    # ============== PROGRESS ==============
+    progress_frame = tk.Frame(main_frame, bg=BG_DARK)
+    progress_frame.pack(fill="x", padx=80)
+    
+    style = ttk.Style(root)
+    style.theme_use("default")
+    style.configure("Stego.Horizontal.TProgressbar", troughcolor=TXT_BG,
+                    background=ACCENT_CYAN, bordercolor=BG_DARK, thickness=8)
+    progress_bar = ttk.Progressbar(progress_frame, style="Stego.Horizontal.TProgressbar",
+                                   maximum=1.0, mode="determinate")
+    progress_bar.pack(side="left", fill="x", expand=True, pady=5)
+    
+    status_label = tk.Label(progress_frame, text="Idle", bg=BG_DARK, fg=ACCENT_PURPLE,
+                            font=("Arial", 10, "bold"), width=28, anchor="w")
+    status_label.pack(side="left", padx=15)
+    
+    def status_text(label, detail):
+        queued = worker.pending - 1
+        return f"{label}: {detail}" + (f" (+{queued} queued)" if queued > 0 else "")
+    
+    def on_progress(label, fraction, stage):
+        progress_bar["value"] = fraction
+        status_label.config(text=status_text(label, stage))
+    
+    def on_finish(kind, label, result):
+        progress_bar["value"] = 0
+        status_label.config(text=f"{worker.pending} queued" if worker.pending else "Idle")
+        if kind == "cancelled":
+            messagebox.showinfo("⏹️ Cancelled", f"{label} was cancelled.")
+        elif kind == "error":
+            messagebox.showerror("❌ Error", result)
+        elif label == "Hide":
+            messagebox.showinfo("✅ Success", result)
+        else:
+            messagebox.showinfo("🔓 Extracted Message", result)
+    
+    worker = StegoWorker(root, on_progress, on_finish)
+    
+    tk.Button(progress_frame, text="⏹ CANCEL", command=worker.cancel,
+             bg=ACCENT_PINK, fg=FG_COLOR, font=("Arial", 10, "bold"),
+             relief="flat", bd=0, padx=15, pady=5, cursor="hand2",
+             activebackground=ACCENT_ORANGE, activeforeground=FG_COLOR).pack(side="left")
+    
     def hide_action():
         img_path = img_entry.get()
         out_path = out_entry.get()
@@ -451,12 +682,9 @@ def create_main_window():
         
         try:
             from stego import hide_message
-            result = hide_message(img_path, out_path, msg)
-            messagebox.showinfo("✅ Success", result)
+            worker.submit("Hide", hide_message, img_path, out_path, msg, highlight="full")
         except ImportError:
             messagebox.showinfo("✅ Success!", "Message hidden successfully!\n(stego module not found)")
-        except Exception as e:
-            messagebox.showerror("❌ Error", str(e))
     
     def extract_action():
         img_path = img_entry.get()
@@ -467,12 +695,9 @@ def create_main_window():
         
         try:
             from stego import extract_message
-            result = extract_message(img_path)
-            messagebox.showinfo("🔓 Extracted Message", result)
+            worker.submit("Extract", extract_message, img_path)
         except ImportError:
             messagebox.showinfo("🔓 Extracted!", "Your hidden message!\n(stego module not found)")
-        except Exception as e:
-            messagebox.showerror("❌ Error", str(e))
     
     hide_btn = SuperGlowingButton(btn_frame, "🔒 HIDE MESSAGE", hide_action, color=ACCENT_GREEN)
     hide_btn.pack(side="left", padx=25)
@@ -494,5 +719,16 @@ def create_main_window():
 
 # ============== RUN ==============
 if __name__ == "__main__":
-    root = create_main_window()
+    import argparse
+    parser = argparse.ArgumentParser(description="Steganography Master GUI")
+    parser.add_argument("--fps", type=int, default=FRAME_RATE, help="animation frame budget")
+    parser.add_argument("--reduced-motion", action="store_true", default=REDUCED_MOTION,
+                        help="static background and buttons (also STEGO_REDUCED_MOTION=1)")
+    parser.add_argument("--cache-mb", type=int, default=0,
+                        help="keep decoded carriers in memory up to this size (default: off)")
+    args = parser.parse_args()
+    if args.cache_mb > 0:
+        from stego import enable_decode_cache
+        enable_decode_cache(args.cache_mb << 20)  # re-hiding into or extracting from a carrier skips decode
+    root = create_main_window(fps=args.fps, reduced_motion=args.reduced_motion)
     root.mainloop()
\ No newline at end of file
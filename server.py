@@ -0,0 +1,538 @@
+from concurrent.futures import ProcessPoolExecutor
+from http import HTTPStatus
+from urllib.parse import parse_qs, urlsplit
+from PIL import Image
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+import stego
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8750
+QUEUE_LIMIT = 16  # jobs allowed to wait for a busy worker before requests get 429
+REQUEST_TIMEOUT = 60.0  # seconds per request, upload and embedding included
+IDLE_TIMEOUT = 15.0  # seconds a keep-alive connection may sit between requests
+LINGER_TIMEOUT = 2.0  # seconds spent discarding an unread body before closing
+MAX_BODY = 256 << 20  # largest accepted upload in bytes
+STREAM_CHUNK = 1 << 16  # bytes per read/write while streaming bodies
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+# ------------------ Pool Jobs ------------------
+# These run in worker processes, so they take paths and return plain dicts.
+
+class _Deadline:
+    """Progress callback that cancels a job once its request has timed out"""
+
+    def __init__(self, deadline: float):
+        self.deadline = deadline
+
+    def __call__(self, fraction: float, stage: str):
+        if time.time() > self.deadline:
+            raise stego.OperationCancelled(f"timed out during {stage}")
+
+def _hide_job(carrier_path: str, payload, output_path: str, options: dict, deadline: float) -> dict:
+    """Hide `payload` (bytes, or the path of a file holding it) into the carrier"""
+    if isinstance(payload, str):
+        with open(payload, "rb") as fp:
+            payload = fp.read()
+    try:
+        result = stego.hide(carrier_path, output_path, payload, progress=_Deadline(deadline), **options)
+    except stego.OperationCancelled:
+        return {"ok": False, "cancelled": True}
+    return {"ok": result.ok, "error": result.error, "bits_embedded": result.bits_embedded,
+            "pixels_touched": result.pixels_touched, "timings": result.timings}
+
+def _extract_job(image_path: str, output_path: str, key, deadline: float) -> dict:
+    """Extract into `output_path`; the payload never travels back through the pool"""
+    try:
+        result = stego.extract(image_path, progress=_Deadline(deadline), key=key)
+    except stego.OperationCancelled:
+        return {"ok": False, "cancelled": True}
+    if result.ok and result.payload is not None:
+        with open(output_path, "wb") as fp:
+            fp.write(result.payload)
+    return {"ok": result.ok, "error": result.error, "found": result.payload is not None,
+            "header": result.header, "timings": result.timings}
+
+def _probe_job(image_path: str, deadline: float) -> dict:
+    """Container header plus carrier size and capacity"""
+    try:
+        with Image.open(image_path) as img:
+            width, height, mode = img.width, img.height, img.mode
+        return {"ok": True, "header": stego.probe(image_path), "width": width, "height": height,
+                "mode": mode, "capacity": stego.capacity(image_path)}
+    except Exception as e:
+        return {"ok": False, "error": f"Cannot open image ({e})"}
+
+# ------------------ Metrics ------------------
+
+class Metrics:
+    """Request counters and latency histograms in the Prometheus text format"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.requests = {}   # (endpoint, status) -> count
+        self.latency = {}    # histogram name -> endpoint -> [bucket counts..., +Inf, sum]
+
+    def observe(self, name: str, endpoint: str, seconds: float):
+        counts = self.latency.setdefault(name, {}).setdefault(endpoint, [0] * (len(self.buckets) + 2))
+        for i, bound in enumerate(self.buckets):
+            if seconds <= bound:
+                counts[i] += 1
+        counts[-2] += 1
+        counts[-1] += seconds
+
+    def count(self, endpoint: str, status: int):
+        self.requests[endpoint, status] = self.requests.get((endpoint, status), 0) + 1
+
+    def render(self, gauges: dict) -> str:
+        lines = ["# HELP stego_requests_total Requests by endpoint and status code",
+                 "# TYPE stego_requests_total counter"]
+        for (endpoint, status), n in sorted(self.requests.items()):
+            lines.append(f'stego_requests_total{{endpoint="{endpoint}",status="{status}"}} {n}')
+        helps = {"stego_request_seconds": "Wall time from request line to last response byte",
+                 "stego_job_seconds": "Time a job spent in the worker pool, queueing included"}
+        for name, help_text in helps.items():
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+            for endpoint, counts in sorted(self.latency.get(name, {}).items()):
+                for bound, n in zip(self.buckets, counts):
+                    lines.append(f'{name}_bucket{{endpoint="{endpoint}",le="{bound:g}"}} {n}')
+                lines.append(f'{name}_bucket{{endpoint="{endpoint}",le="+Inf"}} {counts[-2]}')
+                lines.append(f'{name}_sum{{endpoint="{endpoint}"}} {counts[-1]:.6f}')
+                lines.append(f'{name}_count{{endpoint="{endpoint}"}} {counts[-2]}')
+        for name, value in gauges.items():
+            lines += [f"# TYPE {name} gauge", f"{name} {value}"]
+        return "\n".join(lines) + "\n"
+
+# ------------------ HTTP Server ------------------
+
+class HTTPError(Exception):
+    """Abort a request with this status and a JSON {"error": message} body"""
+
+    def __init__(self, status: int, message: str, headers: dict = None):
+        super().__init__(message)
+        self.status, self.message, self.headers = status, message, headers or {}
+
+class _Request:
+    """One parsed request: its head, streams, deadline and per-request scratch state"""
+
+    def __init__(self, method, target, headers, reader, writer, timeout):
+        url = urlsplit(target)
+        self.method, self.path, self.headers = method, url.path, headers
+        self.query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        self.reader, self.writer = reader, writer
+        self.deadline = time.monotonic() + timeout
+        self.body_read = method == "GET" and "content-length" not in headers \
+            and "transfer-encoding" not in headers
+        self.slot = False   # holds a place in the job queue
+        self.job = None     # pool future, once submitted
+        self.scratch = None
+
+    def remaining(self) -> float:
+        return max(0.0, self.deadline - time.monotonic())
+
+    def workdir(self) -> str:
+        if self.scratch is None:
+            self.scratch = tempfile.mkdtemp(prefix="stego_server_")
+        return self.scratch
+
+    def int_param(self, name: str, default: int) -> int:
+        try:
+            return int(self.query.get(name, default))
+        except ValueError:
+            raise HTTPError(400, f"Query parameter '{name}' must be an integer")
+
+class StegoServer:
+    """Local asyncio HTTP front end for hide/extract/probe with a bounded process pool
+
+    CPU work runs in `workers` processes. At most `queue_limit` jobs wait behind
+    them; further requests are refused with 429 before their body is read.
+    Every request must finish within `timeout` seconds, or it gets 504 and its
+    job is cancelled at the next progress check.
+    """
+
+    def __init__(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, workers: int = None,
+                 queue_limit: int = QUEUE_LIMIT, timeout: float = REQUEST_TIMEOUT, max_body: int = MAX_BODY):
+        self.host, self.port = host, port
+        self.workers = workers or os.cpu_count() or 1
+        self.queue_limit, self.timeout, self.max_body = queue_limit, timeout, max_body
+        self.metrics = Metrics()
+        self.pending = 0   # jobs admitted and not yet finished, running or queued
+        self.pool = None
+        self.server = None
+        self.connections = set()
+        self.routes = {"/hide": ("POST", self._hide), "/extract": ("POST", self._extract),
+                       "/probe": ("POST", self._probe), "/capacity": ("GET", self._capacity),
+                       "/metrics": ("GET", self._metrics)}
+
+    async def start(self) -> int:
+        """Bind and start accepting connections; return the bound port (useful with port=0)"""
+        self.pool = ProcessPoolExecutor(max_workers=self.workers)
+        self.server = await asyncio.start_server(self._connection, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self.port
+
+    async def close(self):
+        self.server.close()
+        for writer in list(self.connections):
+            writer.close()
+        await self.server.wait_closed()
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, lambda: self.pool.shutdown(wait=True, cancel_futures=True))
+
+    async def serve_forever(self):
+        await self.start()
+        async with self.server:
+            await self.server.serve_forever()
+
+    # ---- connection handling ----
+
+    async def _connection(self, reader, writer):
+        self.connections.add(writer)
+        try:
+            while True:
+                try:
+                    line = await asyncio.wait_for(reader.readline(), IDLE_TIMEOUT)
+                except asyncio.TimeoutError:
+                    break
+                if not line:
+                    break
+                try:
+                    method, target, version = line.decode('latin-1').split()
+                    headers = await self._read_headers(reader)
+                except (ValueError, UnicodeDecodeError):
+                    await self._send_json(writer, 400, {"error": "Malformed request"}, close=True)
+                    break
+                request = _Request(method, target, headers, reader, writer, self.timeout)
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                if not await self._dispatch(request):
+                    if not request.body_read:
+                        await self._linger(reader, writer)
+                    break
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self.connections.discard(writer)
+            writer.close()
+
+    async def _linger(self, reader, writer):
+        """Discard an unread body for a moment, so the client reads our error instead of a reset"""
+        writer.write_eof()
+        deadline = time.monotonic() + LINGER_TIMEOUT
+        try:
+            while await asyncio.wait_for(reader.read(STREAM_CHUNK), max(0.0, deadline - time.monotonic())):
+                pass
+        except asyncio.TimeoutError:
+            pass
+
+    async def _read_headers(self, reader) -> dict:
+        headers = {}
+        while True:
+            line = await asyncio.wait_for(reader.readline(), IDLE_TIMEOUT)
+            if line in (b"\r\n", b"\n", b""):
+                return headers
+            name, _, value = line.decode('latin-1').partition(":")
+            if not _:
+                raise ValueError("malformed header")
+            headers[name.strip().lower()] = value.strip()
+
+    async def _dispatch(self, request: _Request) -> bool:
+        """Run one request; return whether the connection can carry another"""
+        start = time.perf_counter()
+        endpoint = request.path if request.path in self.routes else "other"
+        status, close = 500, False
+        try:
+            route = self.routes.get(request.path)
+            if route is None:
+                raise HTTPError(404, f"No endpoint {request.path}")
+            if request.method != route[0]:
+                raise HTTPError(405, f"{request.path} only accepts {route[0]}", {"Allow": route[0]})
+            status = await route[1](request)
+        except HTTPError as e:
+            status, close = e.status, not request.body_read  # unread body bytes would poison the next request
+            await self._send_json(request.writer, e.status, {"error": e.message}, e.headers, close)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            raise
+        except Exception as e:
+            status, close = 500, True
+            await self._send_json(request.writer, 500, {"error": f"Internal error ({e})"}, close=True)
+        finally:
+            if request.slot and request.job is None:
+                self.pending -= 1
+            self._cleanup(request)
+            self.metrics.count(endpoint, status)
+            self.metrics.observe("stego_request_seconds", endpoint, time.perf_counter() - start)
+        return not close
+
+    def _cleanup(self, request: _Request):
+        if request.scratch is None:
+            return
+        remove = lambda *_: shutil.rmtree(request.scratch, ignore_errors=True)
+        if request.job is None or request.job.done():
+            remove()
+        else:
+            request.job.add_done_callback(remove)  # a timed-out job may still be writing there
+
+    # ---- admission, bodies and jobs ----
+
+    async def _admit(self, request: _Request):
+        """Reserve a job slot or refuse with 429, before any of the body is read"""
+        if self.pending >= self.workers + self.queue_limit:
+            raise HTTPError(429, "Server busy, retry later", {"Retry-After": "1"})
+        self.pending += 1
+        request.slot = True
+        if request.headers.get("expect", "").lower() == "100-continue":
+            request.writer.write(b"HTTP/1.1 100 Continue\r\n\r\n")
+            await request.writer.drain()
+
+    async def _timed(self, request: _Request, awaitable):
+        try:
+            return await asyncio.wait_for(awaitable, request.remaining())
+        except asyncio.TimeoutError:
+            raise HTTPError(408, "Request body not received in time")
+
+    async def _body(self, request: _Request):
+        """Yield the request body in chunks, from Content-Length or chunked encoding"""
+        reader, total = request.reader, 0
+        chunked = request.headers.get("transfer-encoding", "").lower() == "chunked"
+        if not chunked and "content-length" not in request.headers:
+            raise HTTPError(411, "A Content-Length or chunked body is required")
+        while True:
+            if chunked:
+                line = await self._timed(request, reader.readline())
+                try:
+                    size = int(line.split(b";")[0], 16)
+                except ValueError:
+                    raise HTTPError(400, "Malformed chunked body")
+                if size == 0:
+                    while await self._timed(request, reader.readline()) not in (b"\r\n", b"\n", b""):
+                        pass  # trailers are ignored
+                    break
+            else:
+                try:
+                    size = int(request.headers["content-length"])
+                except ValueError:
+                    raise HTTPError(400, "Malformed Content-Length")
+            total += size
+            if total > self.max_body:
+                raise HTTPError(413, f"Body larger than {self.max_body} bytes")
+            while size:
+                data = await self._timed(request, reader.read(min(size, STREAM_CHUNK)))
+                if not data:
+                    raise asyncio.IncompleteReadError(b"", size)
+                size -= len(data)
+                yield data
+            if not chunked:
+                break
+            await self._timed(request, reader.readexactly(2))
+        request.body_read = True
+
+    async def _spool(self, request: _Request, names: list, sizes: list) -> list:
+        """Stream the body into files under the request's workdir
+
+        The first `sizes[i]` bytes go to `names[i]`, the rest to the last name.
+        """
+        paths = [os.path.join(request.workdir(), name) for name in names]
+        files = [open(path, "wb") for path in paths]
+        try:
+            index, room = 0, sizes[0] if sizes else None
+            async for data in self._body(request):
+                while data:
+                    take = len(data) if room is None else min(room, len(data))
+                    files[index].write(data[:take])
+                    data = data[take:]
+                    if room is not None:
+                        room -= take
+                        if room == 0:
+                            index += 1
+                            room = sizes[index] if index < len(sizes) else None
+        finally:
+            for fp in files:
+                fp.close()
+        if room:
+            raise HTTPError(400, "Body shorter than X-Payload-Length")
+        return paths
+
+    async def _run(self, request: _Request, endpoint: str, func, *args) -> dict:
+        """Run `func(*args, deadline)` in the pool; its slot is freed when the job really ends"""
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        request.job = loop.run_in_executor(self.pool, func, *args, time.time() + request.remaining())
+
+        def finished(_):
+            self.pending -= 1
+            self.metrics.observe("stego_job_seconds", endpoint, time.perf_counter() - start)
+
+        request.job.add_done_callback(finished)
+        try:
+            outcome = await asyncio.wait_for(asyncio.shield(request.job), request.remaining())
+        except asyncio.TimeoutError:
+            outcome = {"cancelled": True}
+        if outcome.get("cancelled"):
+            raise HTTPError(504, "Request timed out")
+        if not outcome["ok"]:
+            raise HTTPError(422, outcome["error"])
+        return outcome
+
+    # ---- responses ----
+
+    async def _send(self, writer, status: int, body: bytes, content_type: str, headers: dict = None,
+                    close: bool = False):
+        head = [f"HTTP/1.1 {status} {HTTPStatus(status).phrase}", f"Content-Type: {content_type}",
+                f"Content-Length: {len(body)}"]
+        head += [f"{name}: {value}" for name, value in (headers or {}).items()]
+        if close:
+            head.append("Connection: close")
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode('latin-1') + body)
+        await writer.drain()
+
+    async def _send_json(self, writer, status: int, data, headers: dict = None, close: bool = False):
+        await self._send(writer, status, json.dumps(data).encode(), "application/json", headers, close)
+
+    async def _send_file(self, writer, path: str, content_type: str, headers: dict):
+        """Stream a file back in chunks without loading it whole"""
+        head = ["HTTP/1.1 200 OK", f"Content-Type: {content_type}",
+                f"Content-Length: {os.path.getsize(path)}"]
+        head += [f"{name}: {value}" for name, value in headers.items()]
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode('latin-1'))
+        with open(path, "rb") as fp:
+            while chunk := fp.read(STREAM_CHUNK):
+                writer.write(chunk)
+                await writer.drain()
+
+    # ---- endpoints ----
+
+    async def _hide(self, request: _Request) -> int:
+        """Body is the carrier image, preceded by X-Payload-Length payload bytes unless ?message= is given"""
+        message = request.query.get("message")
+        payload_length = request.headers.get("x-payload-length")
+        if (message is None) == (payload_length is None):
+            raise HTTPError(400, "Give the payload as ?message= or as X-Payload-Length body bytes")
+        options = {"compress": request.query.get("compress"), "key": request.headers.get("x-stego-key"),
+                   "depth": request.int_param("depth", 1), "channels": request.query.get("channels", "RGB"),
+                   "compress_level": request.int_param("compress_level", stego.PNG_COMPRESS_LEVEL),
+                   "optimize": request.query.get("optimize", "").lower() in ("1", "true", "yes")}
+        if not 0 <= options["compress_level"] <= 9:
+            raise HTTPError(400, "compress_level must be 0-9")
+        await self._admit(request)
+        if message is not None:
+            carrier, = await self._spool(request, ["carrier"], [])
+            payload = message.encode('utf-8')
+        else:
+            try:
+                size = int(payload_length)
+            except ValueError:
+                size = -1
+            if size < 0:
+                raise HTTPError(400, "Malformed X-Payload-Length")
+            payload, carrier = await self._spool(request, ["payload", "carrier"], [size])
+        output = os.path.join(request.workdir(), "stego.png")
+        outcome = await self._run(request, "/hide", _hide_job, carrier, payload, output, options)
+        await self._send_file(request.writer, output, "image/png", {
+            "X-Bits-Embedded": outcome["bits_embedded"], "X-Pixels-Touched": outcome["pixels_touched"],
+            "X-Timings": json.dumps(outcome["timings"], separators=(",", ":"))})
+        return 200
+
+    async def _extract(self, request: _Request) -> int:
+        """Body is a stego image; the payload comes back as application/octet-stream"""
+        await self._admit(request)
+        image, = await self._spool(request, ["image"], [])
+        output = os.path.join(request.workdir(), "payload.bin")
+        outcome = await self._run(request, "/extract", _extract_job, image, output,
+                                  request.headers.get("x-stego-key"))
+        if not outcome["found"]:
+            raise HTTPError(404, "No hidden message found")
+        await self._send_file(request.writer, output, "application/octet-stream", {
+            "X-Header": json.dumps(outcome["header"], separators=(",", ":")),
+            "X-Timings": json.dumps(outcome["timings"], separators=(",", ":"))})
+        return 200
+
+    async def _probe(self, request: _Request) -> int:
+        await self._admit(request)
+        image, = await self._spool(request, ["image"], [])
+        outcome = await self._run(request, "/probe", _probe_job, image)
+        del outcome["ok"]
+        await self._send_json(request.writer, 200, outcome)
+        return 200
+
+    async def _capacity(self, request: _Request) -> int:
+        """?width=&height=[&mode=&depth=&channels=&legacy=]; pure arithmetic, no pool job"""
+        if "width" not in request.query or "height" not in request.query:
+            raise HTTPError(400, "width and height are required")
+        try:
+            available = stego.capacity_for(request.int_param("width", 0), request.int_param("height", 0),
+                                           request.query.get("mode", "RGB"),
+                                           request.query.get("legacy", "").lower() in ("1", "true", "yes"),
+                                           request.int_param("depth", 1), request.query.get("channels", "RGB"))
+        except ValueError as e:
+            raise HTTPError(400, str(e))
+        await self._send_json(request.writer, 200, {"capacity": available})
+        return 200
+
+    async def _metrics(self, request: _Request) -> int:
+        gauges = {"stego_jobs_pending": self.pending, "stego_jobs_running": min(self.pending, self.workers),
+                  "stego_workers": self.workers, "stego_queue_limit": self.queue_limit}
+        await self._send(request.writer, 200, self.metrics.render(gauges).encode(),
+                         "text/plain; version=0.0.4")
+        return 200
+
+class BackgroundServer:
+    """Run a StegoServer on its own event-loop thread, e.g. for offline tests
+
+    `with BackgroundServer(workers=2) as url:` yields "http://127.0.0.1:<port>";
+    the port is picked by the OS unless given.
+    """
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault("port", 0)
+        self.server = StegoServer(**kwargs)
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+
+    def __enter__(self) -> str:
+        self.thread.start()
+        port = asyncio.run_coroutine_threadsafe(self.server.start(), self.loop).result()
+        return f"http://{self.server.host}:{port}"
+
+    def __exit__(self, *exc):
+        asyncio.run_coroutine_threadsafe(self.server.close(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+# ------------------ Command Line ------------------
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Local HTTP service for stego hide/extract/probe.")
+    parser.add_argument("--host", default=DEFAULT_HOST, help="bind address (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="port (default: 8750)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="worker processes (default: CPU count)")
+    parser.add_argument("--queue", type=int, default=QUEUE_LIMIT,
+                        help="jobs that may wait for a worker before 429 (default: 16)")
+    parser.add_argument("--timeout", type=float, default=REQUEST_TIMEOUT,
+                        help="seconds per request before 504 (default: 60)")
+    parser.add_argument("--max-body-mb", type=int, default=MAX_BODY >> 20,
+                        help="largest upload in MB (default: 256)")
+    args = parser.parse_args(argv)
+
+    server = StegoServer(args.host, args.port, max(1, args.workers), max(0, args.queue), args.timeout,
+                         args.max_body_mb << 20)
+    print(f"Serving on http://{args.host}:{args.port} with {server.workers} workers", file=sys.stderr)
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
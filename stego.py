@@ -1,8 +1,116 @@
-from PIL import Image
+from PIL import Image, TiffImagePlugin
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass, field
+from typing import Optional
+import numpy as np
+import argparse
+import bz2
+import glob
+import hashlib
+import io
+import json
+import lzma
+import math
 import os
+import pickle
+import shutil
+import struct
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+import zlib
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+DELIMITER = "1111111111111110"  # legacy end-of-message marker
+HEADER_MAGIC = b"STEG"
+HEADER_VERSION = 1
+HEADER_FORMAT = ">4sBHII"  # magic, version, flags, payload length, CRC-32 of payload
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+HEADER_PIXELS = -(-HEADER_SIZE * 8 // 3)
+FLAG_CODEC_MASK = 0x0003  # header flag bits 0-1: payload compression codec
+CODECS = {"zlib": 1, "bz2": 2, "lzma": 3}
+COMPRESS_SAMPLE = 1 << 16  # bytes sampled to rank codecs and spot incompressible payloads
+FLAG_DEPTH_SHIFT, FLAG_DEPTH_MASK = 2, 0x000C  # header flag bits 2-3: bits per channel - 1
+FLAG_CHANNELS_SHIFT, FLAG_CHANNELS_MASK = 4, 0x00F0  # bits 4-7: channel mask, 0 = RGB
+FLAG_SCATTER = 0x0100  # header flag bit 8: payload pixels are placed by a keyed permutation
+FLAG_FRAMES = 0x0200  # header flag bit 9: the payload runs on through the following frames
+CHANNEL_NAMES = "RGBA"
+SCATTER_ROUNDS = 4  # Feistel rounds of the keyed permutation
+DEPTHS = (1, 2, 3, 4)
+STRIP_ROWS = 256  # rows per strip in streaming mode
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+PNG_COLOR_MODES = {2: "RGB", 6: "RGBA"}  # 8-bit colour types the streaming mode handles
+PNG_ANCILLARY = (b"PLTE", b"cHRM", b"gAMA", b"iCCP", b"sBIT", b"sRGB", b"cICP", b"bKGD", b"hIST",
+                 b"tRNS", b"pHYs", b"sPLT", b"tEXt", b"zTXt", b"iTXt", b"eXIf")  # copied by streaming mode
+HIGHLIGHT_STYLES = ("full", "mask", "heatmap")
+HEATMAP_BLOCK = 16  # pixels per heatmap cell edge
+PNG_COMPRESS_LEVEL = 6  # Pillow's default for stego outputs
+HIGHLIGHT_COMPRESS_LEVEL = 1  # highlight maps are inspection artifacts: favour speed
+DECODE_CACHE_BYTES = 1 << 30  # default budget of the opt-in decode cache
+ENCODE_THREADS = 4  # concurrent PNG encodes (stego image, highlight map, ...)
+PAYLOAD_CHUNK = 3 << 14  # bytes per embedding chunk; a multiple of 3 keeps chunks pixel-aligned
+FRAME_FORMATS = ("GIF", "PNG", "TIFF")  # multi-frame inputs that keep all their frames
+FRAMES_IN_FLIGHT = 8  # decoded frames allowed to wait for their encode
+TIFF_LOSSLESS = ("raw", "tiff_lzw", "tiff_adobe_deflate", "tiff_deflate", "packbits")
+ENGINES = ("numpy", "loop")
+EXTRACT_BLOCK_PIXELS = 1 << 18  # pixels per extraction block
+SCAN_PIXELS = 1 << 20  # pixels scan() reads per image, from the top rows where payloads start
+SCAN_MIN_CLOSE_PAIRS = 0.09  # below this share of neighbours in one value pair, SPA reads noise rather than payloads
+SCAN_BANDS = 16  # scan() splits its sample into row bands to see how far SPA strays by chance
+SCAN_THRESHOLD = 0.1  # score (a lower bound on the embedding rate) at which scan() calls an image suspicious
+LOSSY_FORMATS = ("JPEG", "MPO")  # pixel LSBs do not survive these, so scan() skips the statistics
+SHARD_MAGIC = b"STGS"
+# magic, payload digest, shard index, shard count, offset and total length of the stored payload,
+# codec id, size of the output-name manifest that follows
+SHARD_FORMAT = ">4s16sHHQQBH"
+SHARD_HEADER_SIZE = struct.calcsize(SHARD_FORMAT)
+# Uncompressed rawmodes that can be embedded in place: byte position of R, G, B(, A) in a pixel
+RAW_MODES = {"RGB": (0, 1, 2), "BGR": (2, 1, 0), "RGBX": (0, 1, 2), "BGRX": (2, 1, 0),
+             "RGBA": (0, 1, 2, 3), "BGRA": (2, 1, 0, 3)}
 
 # ------------------ Helper Functions ------------------
 
+class OperationCancelled(Exception):
+    """Raised from a progress callback to abort a running hide/extract"""
+
+def _report(progress, fraction: float, stage: str):
+    """Forward progress to an optional `progress(fraction, stage)` callback"""
+    if progress is not None:
+        progress(min(max(fraction, 0.0), 1.0), stage)
+
+def _report_done(progress):
+    """Final progress report: the outputs exist by now, so a cancel this late is ignored"""
+    try:
+        _report(progress, 1.0, "done")
+    except OperationCancelled:
+        pass
+
+def _peak_rss() -> Optional[int]:
+    """This process's peak resident set size in bytes, or None where it cannot be read
+
+    Linux's VmHWM belongs to the running program alone, whereas ru_maxrss of a
+    freshly started child already includes its parent's peak.
+    """
+    try:
+        with open("/proc/self/status", encoding='ascii') as fp:
+            for line in fp:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    if resource is None:
+        return None
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == "darwin" else 1024)
+
 def message_to_binary(message: str) -> str:
     """Convert text message to binary string"""
     return ''.join(format(ord(c), '08b') for c in message)
@@ -12,30 +120,242 @@ def binary_to_message(binary: str) -> str:
     chars = [binary[i:i+8] for i in range(0, len(binary), 8)]
     return ''.join(chr(int(c, 2)) for c in chars)
 
-# ------------------ Core Functions ------------------
+def message_to_bits(message: str) -> np.ndarray:
+    """Convert text message plus delimiter to a uint8 array of 0/1 bits"""
+    try:
+        data = message.encode('latin-1') + b'\xff\xfe'  # 0xFFFE == DELIMITER
+        return np.unpackbits(np.frombuffer(data, dtype=np.uint8))
+    except UnicodeEncodeError:
+        # ord(c) > 255 gives wider groups in message_to_binary; mirror it exactly
+        binary = message_to_binary(message) + DELIMITER
+        return np.frombuffer(binary.encode('ascii'), dtype=np.uint8) - ord('0')
 
-def hide_message(image_path: str, output_path: str, message: str) -> str:
-    """Hide a text message in an image using LSB steganography"""
-    if not os.path.exists(image_path):
-        return "Error: Input image not found!"
+# ------------------ Container Format ------------------
 
-    try:
-        img = Image.open(image_path)
-        if img.mode not in ['RGB', 'RGBA']:
-            img = img.convert('RGBA')
-    except Exception as e:
-        return f"Error: Cannot open image! ({e})"
+def _build_header(payload, flags: int = 0) -> bytes:
+    """Pack the versioned container header for a payload buffer"""
+    return struct.pack(HEADER_FORMAT, HEADER_MAGIC, HEADER_VERSION, flags,
+                       len(payload), zlib.crc32(payload))
 
-    # Ensure output path ends with .png
-    if not output_path.lower().endswith(".png"):
-        output_path += ".png"
+def _as_buffer(payload) -> memoryview:
+    """View str, bytes-like or binary file payloads as a flat byte buffer"""
+    if isinstance(payload, str):
+        payload = payload.encode('utf-8')
+    elif hasattr(payload, 'read'):
+        payload = payload.read()
+    return memoryview(payload).cast('B')
 
-    binary_msg = message_to_binary(message) + "1111111111111110"  # delimiter
-    total_bits = len(binary_msg)
+def _iter_container_bits(payload: memoryview, flags: int = 0):
+    """Yield header and payload bits in pixel-aligned chunks, never the whole payload at once"""
+    yield np.unpackbits(np.frombuffer(_build_header(payload, flags), dtype=np.uint8))
+    for start in range(0, len(payload), PAYLOAD_CHUNK):
+        chunk = np.frombuffer(payload[start:start + PAYLOAD_CHUNK], dtype=np.uint8)
+        yield np.unpackbits(chunk)
+
+def _parse_header(data: bytes):
+    """Decode container header fields, or return None if there is no valid header"""
+    if len(data) < HEADER_SIZE:
+        return None
+    magic, version, flags, length, checksum = struct.unpack(HEADER_FORMAT, data[:HEADER_SIZE])
+    if magic != HEADER_MAGIC or version != HEADER_VERSION:
+        return None
+    codec = next((name for name, cid in CODECS.items() if cid == flags & FLAG_CODEC_MASK), None)
+    depth = ((flags & FLAG_DEPTH_MASK) >> FLAG_DEPTH_SHIFT) + 1
+    mask = (flags & FLAG_CHANNELS_MASK) >> FLAG_CHANNELS_SHIFT
+    channels = "".join(c for i, c in enumerate(CHANNEL_NAMES) if mask >> i & 1) or "RGB"
+    return {"version": version, "flags": flags, "length": length, "checksum": checksum,
+            "codec": codec, "depth": depth, "channels": channels, "scattered": bool(flags & FLAG_SCATTER),
+            "frames": bool(flags & FLAG_FRAMES),
+            "pixels": _container_pixels(length, depth, len(channels))}
+
+def _parse_layout(depth: int, channels: str) -> tuple:
+    """Validate bits per channel and a channel string such as "RGB" or "GA"; return (depth, indices)"""
+    if depth not in DEPTHS:
+        raise ValueError(f"Bit depth must be 1 to 4, not {depth}")
+    names = channels.upper()
+    if not names or set(names) - set(CHANNEL_NAMES) or len(set(names)) != len(names):
+        raise ValueError(f"Invalid channels '{channels}' (use letters from {CHANNEL_NAMES})")
+    return depth, tuple(sorted(CHANNEL_NAMES.index(c) for c in names))
+
+def _layout_flags(depth: int, indices: tuple) -> int:
+    """Header flag bits recording a payload layout (the default RGB layout encodes as 0)"""
+    mask = 0 if indices == (0, 1, 2) else sum(1 << i for i in indices)
+    return (depth - 1) << FLAG_DEPTH_SHIFT | mask << FLAG_CHANNELS_SHIFT
+
+def _container_pixels(length: int, depth: int = 1, channels: int = 3) -> int:
+    """Pixels a container spans: the header at one bit per RGB channel, then the payload"""
+    return HEADER_PIXELS + -(-length * 8 // (depth * channels))
+
+def _compress(data, codec: str) -> bytes:
+    """Compress with a stdlib codec at its default setting"""
+    if codec == "zlib":
+        return zlib.compress(data)
+    if codec == "bz2":
+        return bz2.compress(data)
+    return lzma.compress(data)
+
+def _decompress(data: bytes, codec: str) -> bytes:
+    if codec == "zlib":
+        return zlib.decompress(data)
+    if codec == "bz2":
+        return bz2.decompress(data)
+    return lzma.decompress(data)
+
+def _compress_sample(payload: memoryview) -> bytes:
+    """Up to COMPRESS_SAMPLE bytes of the payload, as four evenly spaced slices"""
+    if len(payload) <= COMPRESS_SAMPLE:
+        return bytes(payload)
+    piece = COMPRESS_SAMPLE // 4
+    step = (len(payload) - piece) // 3
+    return b"".join(payload[i * step:i * step + piece] for i in range(4))
+
+def _compress_payload(payload: memoryview, compress):
+    """Apply `compress` ("auto" or a codec name); return (stored bytes, codec or None)
+
+    "auto" ranks the codecs on a sample, compresses the payload with the best one
+    only, and falls back to storing the payload raw when that is not smaller.
+    """
+    if not compress:
+        return payload, None
+    if compress != "auto":
+        return memoryview(_compress(payload, compress)), compress
+
+    # A cheap zlib pass over the sample rules out already-compressed data
+    sample = _compress_sample(payload)
+    if len(sample) and len(zlib.compress(sample, 1)) >= len(sample):
+        return payload, None
+    codec = min(CODECS, key=lambda name: len(_compress(sample, name)))
+    packed = _compress(payload, codec)
+    if len(packed) >= len(payload):
+        return payload, None
+    return memoryview(packed), codec
+
+# ------------------ Keyed Scatter ------------------
+
+def _mix64(x: np.ndarray) -> np.ndarray:
+    """MurmurHash3 finalizer on a uint64 array (wrapping arithmetic)"""
+    x = x ^ (x >> np.uint64(33))
+    x = x * np.uint64(0xFF51AFD7ED558CCD)
+    x = x ^ (x >> np.uint64(33))
+    x = x * np.uint64(0xC4CEB9FE1A85EC53)
+    return x ^ (x >> np.uint64(33))
+
+class _KeyedPermutation:
+    """Keyed bijection on range(size), evaluated lazily for any batch of indices
+
+    A balanced Feistel network permutes the smallest even-bit power of two that
+    covers `size` (at most 4x larger); outputs past `size` are cycle-walked back
+    in. Nothing proportional to `size` is ever built.
+    """
+
+    def __init__(self, key, size: int):
+        self.size = size
+        half = max(1, (max(size - 1, 1).bit_length() + 1) // 2)
+        self.half = np.uint64(half)
+        self.mask = np.uint64((1 << half) - 1)
+        key = key.encode('utf-8') if isinstance(key, str) else bytes(key)
+        digest = hashlib.blake2b(key, digest_size=8 * SCATTER_ROUNDS, person=b"stego-scatter").digest()
+        self.round_keys = np.frombuffer(digest, dtype=">u8").astype(np.uint64)
+
+    def _feistel(self, x: np.ndarray) -> np.ndarray:
+        left, right = x >> self.half, x & self.mask
+        for k in self.round_keys:
+            left, right = right, left ^ (_mix64(right ^ k) & self.mask)
+        return (left << self.half) | right
+
+    def __call__(self, indices: np.ndarray) -> np.ndarray:
+        x = self._feistel(np.asarray(indices, dtype=np.uint64))
+        outside = np.flatnonzero(x >= self.size)
+        while outside.size:
+            x[outside] = self._feistel(x[outside])
+            outside = outside[x[outside] >= self.size]
+        return x.astype(np.int64)
+
+def _scatter_for(key, n_pixels: int):
+    """Permutation of the payload pixels (everything after the header) for a key, or None"""
+    if key is None:
+        return None
+    return _KeyedPermutation(key, n_pixels - HEADER_PIXELS)
+
+def _pixel_order(n_pixels: int, scatter=None, block: int = 1 << 12):
+    """Yield pixel indices in embedding order: raster, or header then keyed payload pixels"""
+    if scatter is None:
+        yield from range(n_pixels)
+        return
+    yield from range(min(HEADER_PIXELS, n_pixels))
+    for start in range(0, scatter.size, block):
+        stop = min(start + block, scatter.size)
+        yield from (HEADER_PIXELS + scatter(np.arange(start, stop))).tolist()
+
+# ------------------ Pixel Planes ------------------
+
+def _lsb_values(values: np.ndarray, depth: int) -> np.ndarray:
+    """Unpack the low `depth` bits of each value, most significant first"""
+    if depth == 1:
+        return values & 1
+    shifts = np.arange(depth - 1, -1, -1, dtype=np.uint8)
+    return ((values[:, None] >> shifts) & 1).reshape(-1)
+
+def _read_payload(source, header: dict, scatter=None):
+    """Read the payload a container header describes, or None if its channels are missing"""
+    indices = [CHANNEL_NAMES.index(c) for c in header["channels"]]
+    if isinstance(source, _MappedCarrier):
+        if max(indices) >= len(source.positions):
+            return None
+        # Only the bytes holding payload bits are read from the map
+        n_payload = header["pixels"] - HEADER_PIXELS
+        blocks = []
+        for j in range(0, n_payload, EXTRACT_BLOCK_PIXELS):
+            pixels = np.arange(j, min(j + EXTRACT_BLOCK_PIXELS, n_payload))
+            blocks.append(source.get(HEADER_PIXELS + (pixels if scatter is None else scatter(pixels)), indices))
+        values = np.concatenate(blocks).reshape(-1) if blocks else np.zeros(0, dtype=np.uint8)
+        bits = _lsb_values(values, header["depth"])
+        return np.packbits(bits[:header["length"] * 8]).tobytes()
+    if scatter is None:
+        img = _open_rows(source, -(-header["pixels"] // _open(source).width))
+    else:
+        img = _open(source)  # scattered pixels may sit anywhere in the image
+    if img.mode not in ['RGB', 'RGBA']:
+        img = img.convert('RGBA')
+    arr = np.asarray(img)
+    if max(indices) >= arr.shape[2]:
+        return None
+    flat = arr.reshape(-1, arr.shape[2])
+    if scatter is None:
+        values = flat[HEADER_PIXELS:header["pixels"], indices].reshape(-1)
+    else:
+        # Gather payload pixels block by block so index arrays stay bounded
+        n_payload = header["pixels"] - HEADER_PIXELS
+        blocks = [flat[HEADER_PIXELS + scatter(np.arange(j, min(j + EXTRACT_BLOCK_PIXELS, n_payload)))][:, indices]
+                  for j in range(0, n_payload, EXTRACT_BLOCK_PIXELS)]
+        values = np.concatenate(blocks).reshape(-1) if blocks else np.zeros(0, dtype=np.uint8)
+    bits = _lsb_values(values, header["depth"])
+    return np.packbits(bits[:header["length"] * 8]).tobytes()
 
-    if img.width * img.height * 3 < total_bits:
-        return "Error: Image too small to hide this message!"
+def _read_lsb_bytes(source, start: int, count: int) -> bytes:
+    """Read `count` bytes stored in the RGB LSB plane, starting at byte `start`"""
+    img = _open(source)
+    end_bit = (start + count) * 8
+    if isinstance(img, _MappedCarrier):
+        lsb = (img.get(np.arange(-(-end_bit // 3)), (0, 1, 2)) & 1).reshape(-1)
+        return np.packbits(lsb[start * 8:end_bit]).tobytes()
+    rows = -(-end_bit // (3 * img.width))
+    img = _open_rows(source, rows)
+    if img.mode not in ['RGB', 'RGBA']:
+        img = img.convert('RGBA')
+    lsb = (np.asarray(img)[:, :, :3] & 1).reshape(-1)
+    return np.packbits(lsb[start * 8:end_bit]).tobytes()
 
+# ------------------ Embedding Engines ------------------
+
+def _embed_loop(img: Image.Image, binary_msg: str, layout=None, scatter=None) -> Image.Image:
+    """Reference engine: embed bits pixel by pixel, return highlight image
+
+    Bits go one per RGB channel; with a (depth, indices) `layout` the pixels
+    after the container header take `depth` bits in each listed channel, and
+    with a `scatter` permutation those pixels are visited in keyed order.
+    """
+    total_bits = len(binary_msg)
     pixels = img.load()
     data_index = 0
 
@@ -43,58 +363,2262 @@ def hide_message(image_path: str, output_path: str, message: str) -> str:
     highlight_img = img.copy()
     highlight_pixels = highlight_img.load()
 
-    for y in range(img.height):
-        for x in range(img.width):
-            if data_index >= total_bits:
-                img.save(output_path)
-                # avoid overwriting highlight image if it exists
-                highlight_path = f"highlight_{os.path.basename(output_path)}"
-                highlight_img.save(highlight_path)
-                return f"Message hidden successfully!\nSaved as: {output_path}\nHighlighted pixels: {highlight_path}"
-
-            r, g, b, *rest = pixels[x, y]  # works for RGB or RGBA
-            a = rest[0] if rest else 255
-            orig_pixel = (r, g, b, a)
-
-            # Hide bits in RGB channels
-            r = (r & ~1) | int(binary_msg[data_index]); data_index += 1
-            if data_index < total_bits:
-                g = (g & ~1) | int(binary_msg[data_index]); data_index += 1
-            if data_index < total_bits:
-                b = (b & ~1) | int(binary_msg[data_index]); data_index += 1
-
-            pixels[x, y] = (r, g, b, a)
-
-            # Highlight changed pixels in red
-            highlight_pixels[x, y] = (255, 0, 0, a) if (r, g, b, a) != orig_pixel else (r, g, b, a)
-
-    img.save(output_path)
-    highlight_img.save(f"highlight_{os.path.basename(output_path)}")
-    return f"Message hidden successfully!\nSaved as: {output_path}\nHighlighted pixels: highlight_{os.path.basename(output_path)}"
-
-def extract_message(image_path: str) -> str:
-    """Extract hidden message from an image"""
-    if not os.path.exists(image_path):
-        return "Error: Image not found!"
+    for index in _pixel_order(img.width * img.height, scatter):
+        if data_index >= total_bits:
+            return highlight_img
+        x, y = index % img.width, index // img.width
+
+        orig_pixel = pixels[x, y]  # RGB or RGBA
+        pixel = list(orig_pixel)
+        depth, channels = (1, (0, 1, 2))
+        if layout and index >= HEADER_PIXELS:
+            depth, channels = layout
+
+        # Hide bits in the low bits of each channel, most significant first
+        for c in channels:
+            for shift in range(depth - 1, -1, -1):
+                if data_index < total_bits:
+                    bit = int(binary_msg[data_index]); data_index += 1
+                    pixel[c] = (pixel[c] & ~(1 << shift)) | (bit << shift)
+
+        pixels[x, y] = tuple(pixel)
+
+        # Highlight changed pixels in red
+        highlight_pixels[x, y] = (255, 0, 0, *pixel[3:]) if tuple(pixel) != orig_pixel else tuple(pixel)
+
+    return highlight_img
+
+def _write_lsb(region: np.ndarray, bits: np.ndarray, depth: int = 1, channels: tuple = (0, 1, 2)) -> np.ndarray:
+    """Write bits into the low `depth` bits of `channels` of a (pixels, channels) view
+
+    Returns the changed-pixel mask. A trailing partial group only replaces as many
+    low bits as it has, starting from the top of the group.
+    """
+    channels = list(channels)
+    n_pixels = -(-len(bits) // (depth * len(channels)))
+    original = region[:n_pixels].copy()
+    values = original[:, channels].reshape(-1)
+    if depth == 1:
+        values[:len(bits)] = (values[:len(bits)] & 0xFE) | bits
+    else:
+        n_groups = len(bits) // depth
+        weights = 1 << np.arange(depth - 1, -1, -1, dtype=np.uint8)
+        groups = bits[:n_groups * depth].reshape(-1, depth) @ weights
+        values[:n_groups] = (values[:n_groups] & (0xFF << depth & 0xFF)) | groups
+        for k, bit in enumerate(bits[n_groups * depth:]):
+            shift = depth - 1 - k
+            values[n_groups] = (int(values[n_groups]) & ~(1 << shift)) | (int(bit) << shift)
+    region[:n_pixels, channels] = values.reshape(n_pixels, len(channels))
+    return np.any(region[:n_pixels] != original, axis=1)
+
+def _embed_chunks(bit_chunks, total_bits: int, write, layout=None, progress=None):
+    """Feed bit chunks to `write(p0, p1, bits, depth, indices)` in whole pixels
+
+    With a (depth, indices) `layout`, chunks after the first (the container header)
+    go into the low `depth` bits of the listed channels.
+    """
+    depth, indices = 1, (0, 1, 2)
+    pixel, pos = 0, 0
+    pending = np.zeros(0, dtype=np.uint8)
+    for index, bits in enumerate(bit_chunks):
+        if index == 1 and layout:
+            # The header fills whole pixels, so the payload layout starts on a pixel boundary
+            depth, indices = layout
+        pos += len(bits)
+        if len(pending):
+            bits = np.concatenate([pending, bits])
+        # Only whole pixels are written now; leftover bits carry into the next chunk
+        per_pixel = depth * len(indices)
+        whole = len(bits) // per_pixel * per_pixel
+        p1 = pixel + whole // per_pixel
+        write(pixel, p1, bits[:whole], depth, indices)
+        pixel, pending = p1, bits[whole:]
+        _report(progress, 0.1 + 0.7 * pos / total_bits, "embed")
+    if len(pending):
+        write(pixel, pixel + 1, pending, depth, indices)
+
+def _embed_numpy(img: Image.Image, bit_chunks, total_bits: int, highlight=None, progress=None,
+                 layout=None, scatter=None) -> tuple:
+    """Vectorized engine: write bit chunks into the LSB plane, chunk by chunk
+
+    A `scatter` permutation moves the payload pixels (after the header) to keyed
+    positions, computed one chunk at a time.
+    """
+    arr = np.array(img)
+    height, width, channels = arr.shape
+
+    # Pixels in raster order; a changed mask is only kept when a highlight is wanted
+    region = arr.reshape(-1, channels)
+    changed = np.zeros(height * width, dtype=bool) if highlight else None
+
+    def write(p0: int, p1: int, bits: np.ndarray, depth: int, indices: tuple):
+        if scatter is None or p0 < HEADER_PIXELS:
+            where = slice(p0, p1)
+            mask = _write_lsb(region[where], bits, depth, indices)
+        else:
+            where = HEADER_PIXELS + scatter(np.arange(p0 - HEADER_PIXELS, p1 - HEADER_PIXELS))
+            block = region[where]
+            mask = _write_lsb(block, bits, depth, indices)
+            region[where] = block
+        if changed is not None:
+            changed[where] = mask
+
+    _embed_chunks(bit_chunks, total_bits, write, layout, progress)
+    stego_img = Image.fromarray(arr, img.mode)
+    stego_img.info = dict(img.info)  # ICC profile, transparency, ... are saved like the loop engine's
+    return stego_img, _render_highlight(arr, changed, highlight)
+
+def _embed_mapped(carrier, bit_chunks, total_bits: int, layout=None, scatter=None):
+    """Write bit chunks straight into a memory-mapped carrier, touching only the bytes they need"""
+
+    def write(p0: int, p1: int, bits: np.ndarray, depth: int, indices: tuple):
+        pixels = np.arange(p0, p1)
+        if scatter is not None and p0 >= HEADER_PIXELS:
+            pixels = HEADER_PIXELS + scatter(pixels - HEADER_PIXELS)
+        values = carrier.get(pixels, indices)
+        _write_lsb(values, bits, depth, range(len(indices)))
+        carrier.put(pixels, indices, values)
+
+    _embed_chunks(bit_chunks, total_bits, write, layout)
+
+def _changed_mask(before: np.ndarray, after: np.ndarray) -> np.ndarray:
+    """Flattened per-pixel mask of pixels that differ between two arrays"""
+    return np.any(before != after, axis=-1).reshape(-1)
+
+def _render_highlight(arr: np.ndarray, changed: np.ndarray, style):
+    """Render the changed-pixel mask (raster order, may be short) in the requested style"""
+    if not style:
+        return None
+    height, width, channels = arr.shape
+    mask = np.zeros(height * width, dtype=bool)
+    mask[:len(changed)] = changed
+    mask = mask.reshape(height, width)
+
+    if style == "mask":
+        return Image.fromarray(mask)  # mode '1': one bit per pixel
+    if style == "heatmap":
+        # Fraction of changed pixels per block, as a small greyscale image
+        block = HEATMAP_BLOCK
+        padded = np.zeros((-(-height // block) * block, -(-width // block) * block), dtype=np.float32)
+        padded[:height, :width] = mask
+        density = padded.reshape(padded.shape[0] // block, block, -1, block).mean(axis=(1, 3))
+        return Image.fromarray(np.round(density * 255).astype(np.uint8), 'L')
+
+    highlight = arr.copy()
+    highlight[mask, :3] = (255, 0, 0)
+    return Image.fromarray(highlight, 'RGBA' if channels == 4 else 'RGB')
+
+# ------------------ Streaming PNG Mode ------------------
+
+class _BlockReader:
+    """Hand out exact-size reads from a generator of byte blocks"""
+
+    def __init__(self, blocks):
+        self.blocks = blocks
+        self.buffer = bytearray()
+
+    def read(self, size: int) -> bytes:
+        while len(self.buffer) < size:
+            block = next(self.blocks, None)
+            if block is None:
+                break
+            self.buffer += block
+        data = bytes(self.buffer[:size])
+        del self.buffer[:size]
+        return data
+
+    def rest(self):
+        if self.buffer:
+            yield bytes(self.buffer)
+            self.buffer.clear()
+        yield from self.blocks
+
+def _read_png_header(fp):
+    """Parse signature and IHDR; return (width, height, depth, color_type, interlace) or None"""
+    if fp.read(8) != PNG_SIGNATURE:
+        return None
+    length, cid = struct.unpack(">I4s", fp.read(8))
+    if cid != b"IHDR" or length != 13:
+        return None
+    width, height, depth, color_type, _, _, interlace = struct.unpack(">IIBBBBB", fp.read(13))
+    fp.read(4)  # CRC
+    return width, height, depth, color_type, interlace
+
+def _iter_png_scanlines(fp, block_size: int = 1 << 16, extra: list = None):
+    """Yield the inflated IDAT stream (filtered scanlines) in bounded blocks
+
+    Chunks worth keeping (PNG_ANCILLARY, or unknown but marked safe to copy) are
+    appended to `extra` as (type, data, after_idat) when a list is given.
+    """
+    inflater = zlib.decompressobj()
+    after_idat = False
+    while True:
+        chunk_header = fp.read(8)
+        if len(chunk_header) < 8:
+            break
+        length, cid = struct.unpack(">I4s", chunk_header)
+        if cid == b"IEND":
+            break
+        if cid != b"IDAT":
+            if extra is not None and (cid in PNG_ANCILLARY or cid[0] & cid[3] & 0x20):
+                extra.append((cid, fp.read(length), after_idat))
+                fp.read(4)  # CRC
+            else:
+                fp.seek(length + 4, os.SEEK_CUR)
+            continue
+        after_idat = True
+        data = fp.read(length)
+        fp.read(4)  # CRC
+        while data:
+            out = inflater.decompress(data, block_size)
+            data = inflater.unconsumed_tail
+            if out:
+                yield out
+    tail = inflater.flush()
+    if tail:
+        yield tail
+
+def _write_png_chunk(fp, cid: bytes, data: bytes):
+    """Write one PNG chunk with its length and CRC"""
+    fp.write(struct.pack(">I", len(data)) + cid + data)
+    fp.write(struct.pack(">I", zlib.crc32(cid + data)))
+
+def _unfilter_rows(mode: str, width: int, prev_row: bytes, filtered: bytes) -> np.ndarray:
+    """Undo PNG row filters for a strip, given the unfiltered row above it"""
+    rows = len(filtered) // (len(prev_row) + 1)
+    # Prefix the known previous row unfiltered so Up/Avg/Paeth rows resolve against it
+    stream = zlib.compress(b"\x00" + prev_row + filtered, 0)
+    strip = Image.frombytes(mode, (width, rows + 1), stream, "zip", mode)
+    return np.array(strip)[1:]
+
+def _filter_rows(prev_row: np.ndarray, rows: np.ndarray) -> bytes:
+    """Apply the PNG Up filter to a strip of rows"""
+    stacked = np.concatenate([prev_row[None], rows])
+    out = np.empty((len(rows), 1 + rows[0].size), dtype=np.uint8)
+    out[:, 0] = 2  # filter type Up
+    out[:, 1:] = np.diff(stacked, axis=0).reshape(len(rows), -1)
+    return out.tobytes()
+
+def _container_bit_range(header: bytes, payload: memoryview, start: int, stop: int) -> np.ndarray:
+    """Return container bits [start, stop) without unpacking anything outside that range"""
+    first, last = start // 8, -(-stop // 8)
+    head = header[first:last]
+    body = payload[max(first - len(header), 0):max(last - len(header), 0)]
+    data = np.frombuffer(head + bytes(body), dtype=np.uint8)
+    return np.unpackbits(data)[start - first * 8:stop - first * 8]
+
+def _stream_embed(image_path: str, output_path: str, payload: memoryview, strip_rows: int,
+                  compress_level: int) -> dict:
+    """Embed a container into an 8-bit RGB/RGBA PNG strip by strip; None if unsupported
+
+    The output is written to a temp file and renamed into place, and ancillary
+    chunks (colour profile, transparency, physical size, text, ...) are copied.
+    """
+    with open(image_path, "rb") as src:
+        info = _read_png_header(src)
+        if info is None:
+            return None
+        width, height, depth, color_type, interlace = info
+        if depth != 8 or interlace or color_type not in PNG_COLOR_MODES:
+            return None
+        mode = PNG_COLOR_MODES[color_type]
+        channels = len(mode)
+        stride = width * channels
+
+        header = _build_header(payload)
+        total_bits = (len(header) + len(payload)) * 8
+        if width * height * 3 < total_bits:
+            raise ValueError("Image too small to hide this message")
+        touched_rows = -(-total_bits // (3 * width))
 
+        extra = []  # ancillary chunks, collected as the scanline reader passes them
+        reader = _BlockReader(_iter_png_scanlines(src, extra=extra))
+        deflater = zlib.compressobj(compress_level)
+        prev_in = bytes(stride)                       # original row above, unfiltered
+        prev_out = np.zeros((width, channels), dtype=np.uint8)  # written row above
+        strips = 0
+        temp = _temp_path(output_path)
+
+        try:
+            with open(temp, "wb") as dst:
+                dst.write(PNG_SIGNATURE)
+                _write_png_chunk(dst, b"IHDR", struct.pack(">IIBBBBB", width, height, 8, color_type, 0, 0, 0))
+                started = False
+
+                def write_idat(data: bytes):
+                    nonlocal started
+                    if not started:
+                        # The reader has reached the first IDAT, so every chunk before it is known
+                        for cid, chunk, after_idat in extra:
+                            if not after_idat:
+                                _write_png_chunk(dst, cid, chunk)
+                        started = True
+                    _write_png_chunk(dst, b"IDAT", data)
+
+                def emit(data: bytes):
+                    compressed = deflater.compress(data)
+                    if compressed:
+                        write_idat(compressed)
+
+                # Decode, embed and re-filter only the strips the payload reaches,
+                # plus the first untouched row whose filter referenced a changed row
+                y = 0
+                while y < min(touched_rows + 1, height):
+                    rows = min(strip_rows, touched_rows + 1 - y, height - y)
+                    strip = _unfilter_rows(mode, width, prev_in, reader.read(rows * (stride + 1)))
+                    prev_in = strip[-1].tobytes()
+                    bit0 = y * width * 3
+                    bit1 = min((y + rows) * width * 3, total_bits)
+                    if bit0 < bit1:
+                        _write_lsb(strip.reshape(-1, channels), _container_bit_range(header, payload, bit0, bit1))
+                    emit(_filter_rows(prev_out, strip))
+                    prev_out = strip[-1]
+                    strips += 1
+                    y += rows
+
+                # The remaining rows are byte-identical, filters included: copy them through
+                for block in reader.rest():
+                    emit(block)
+                write_idat(deflater.flush())
+                for cid, chunk, after_idat in extra:
+                    if after_idat:
+                        _write_png_chunk(dst, cid, chunk)
+                _write_png_chunk(dst, b"IEND", b"")
+            os.replace(temp, output_path)
+        finally:
+            if os.path.exists(temp):
+                os.remove(temp)
+
+    return {"output": output_path, "strips_embedded": strips,
+            "strips_total": -(-height // strip_rows)}
+
+# ------------------ Memory-Mapped Carriers ------------------
+
+def _raw_layout(path):
+    """Locate the pixel bytes of an uncompressed 8-bit RGB/RGBA file, or return None
+
+    Returns (format, width, height, file offset of each row, bytes per pixel,
+    byte position of R, G, B(, A) within a pixel). Row padding and bottom-up
+    row order are folded into the row offsets. BMP, PPM and NPY headers are
+    parsed here, since their pixel count is no reason to refuse a memory map;
+    TIFF strip offsets come from Pillow.
+    """
+    try:
+        with open(path, "rb") as fp:
+            head = fp.read(64)
+            if head.startswith(b"\x93NUMPY"):
+                fp.seek(0)
+                version = np.lib.format.read_magic(fp)
+                if version == (1, 0):
+                    shape, fortran, dtype = np.lib.format.read_array_header_1_0(fp)
+                else:
+                    shape, fortran, dtype = np.lib.format.read_array_header_2_0(fp)
+                if fortran or dtype != np.uint8 or len(shape) != 3 or shape[2] not in (3, 4):
+                    return None
+                height, width, bpp = shape
+                rows = fp.tell() + np.arange(height, dtype=np.int64) * (width * bpp)
+                layout = ("NPY", width, height, rows, bpp, tuple(range(bpp)))
+            elif head.startswith(b"BM") and len(head) >= 54:
+                offset, dib = struct.unpack_from("<II", head, 10)
+                width, height, _, bpp, compression = struct.unpack_from("<iiHHI", head, 18)
+                if dib < 40 or compression != 0 or bpp not in (24, 32) or width <= 0 or height == 0:
+                    return None
+                stride = (width * bpp + 31) // 32 * 4  # rows are padded to 4 bytes
+                rows = offset + np.arange(abs(height), dtype=np.int64) * stride
+                if height > 0:
+                    rows = rows[::-1]  # positive height means bottom-up rows
+                layout = ("BMP", width, abs(height), rows, bpp // 8, RAW_MODES["BGR" if bpp == 24 else "BGRX"])
+            elif head[:2] == b"P6":
+                fields, pos = [], 2
+                while len(fields) < 3:
+                    while pos < len(head) and head[pos:pos + 1].isspace():
+                        pos += 1
+                    if head[pos:pos + 1] == b"#":
+                        pos = head.index(b"\n", pos)
+                        continue
+                    end = pos
+                    while end < len(head) and head[end:end + 1].isdigit():
+                        end += 1
+                    if end == pos:
+                        return None
+                    fields.append(int(head[pos:end]))
+                    pos = end
+                width, height, maxval = fields
+                if maxval != 255:
+                    return None
+                rows = pos + 1 + np.arange(height, dtype=np.int64) * (width * 3)
+                layout = ("PPM", width, height, rows, 3, RAW_MODES["RGB"])
+            else:
+                layout = _tiff_layout(path)
+    except (OSError, ValueError, struct.error):
+        return None
+    if layout is None or layout[2] == 0:
+        return None
+    if layout[3].max() + layout[1] * layout[4] > os.path.getsize(path):
+        return None  # truncated file
+    return layout
+
+def _tiff_layout(path):
+    """Row offsets of an uncompressed TIFF (or other raw Pillow format), or None"""
     try:
-        img = Image.open(image_path)
+        img = Image.open(path)
+    except Exception:
+        return None
+    rawmodes = set()
+    rows = np.full(img.height, -1, dtype=np.int64)
+    for codec, extents, offset, args in img.tile:
+        if codec != "raw":
+            return None
+        rawmode, stride, orientation = (args, 0, 1) if isinstance(args, str) else (tuple(args) + (0, 1))[:3]
+        x0, y0, x1, y1 = extents
+        if (x0, x1) != (0, img.width):
+            return None
+        rawmodes.add(rawmode)
+        band = np.arange(y1 - y0, dtype=np.int64)
+        if orientation < 0:
+            band = band[::-1]
+        rows[y0:y1] = offset + band * (stride or img.width * len(rawmode))
+    if len(rawmodes) != 1 or (rows < 0).any():
+        return None
+    rawmode = rawmodes.pop()
+    if rawmode not in RAW_MODES:
+        return None
+    return img.format, img.width, img.height, rows, len(rawmode), RAW_MODES[rawmode]
+
+class _MappedCarrier:
+    """Pixel bytes of an uncompressed carrier file, read and written through a memory map
+
+    Quacks enough like an Image (size, width, height, mode) for probe() and capacity().
+    """
+
+    def __init__(self, path, layout: tuple, writable: bool = False):
+        self.path = path
+        self.format, self.width, self.height, self.rows, self.bpp, self.positions = layout
+        self.size = (self.width, self.height)
+        self.mode = "RGBA" if len(self.positions) == 4 else "RGB"
+        self.writable = writable
+        self.data = np.memmap(path, dtype=np.uint8, mode="r+" if writable else "r")
+
+    def offsets(self, pixels: np.ndarray, channels) -> np.ndarray:
+        """File offsets of the given channels of raster-order pixel indices, shape (pixels, channels)"""
+        pixels = np.asarray(pixels, dtype=np.int64)
+        base = self.rows[pixels // self.width] + pixels % self.width * self.bpp
+        return base[:, None] + np.array([self.positions[c] for c in channels], dtype=np.int64)
+
+    def get(self, pixels: np.ndarray, channels) -> np.ndarray:
+        return self.data[self.offsets(pixels, channels)]
+
+    def put(self, pixels: np.ndarray, channels, values: np.ndarray):
+        self.data[self.offsets(pixels, channels)] = values
+
+    def to_image(self) -> Image.Image:
+        """Decode the whole file, for code paths that need a PIL image"""
+        if self.format == "NPY":
+            return Image.fromarray(np.load(self.path))
+        return Image.open(self.path)
+
+    def close(self):
+        if self.writable:
+            self.data.flush()
+        self.data = None
+
+def _map_carrier(path, writable: bool = False):
+    """Memory-map an uncompressed carrier file, or return None for other formats"""
+    layout = _raw_layout(path)
+    return _MappedCarrier(path, layout, writable) if layout else None
+
+class _ArrayCarrier(_MappedCarrier):
+    """A decoded RGB/RGBA array behind the same read-only interface as a memory map
+
+    `format` and `mode` are those of the file it was decoded from, as Image.open()
+    would report them; `info` is restored on the image to_image() returns.
+    """
+
+    def __init__(self, array: np.ndarray, path=None, info=None, format=None, mode=None):
+        self.path, self.format, self.writable = path, format, False
+        self.height, self.width, channels = array.shape
+        self.size = (self.width, self.height)
+        self.positions = tuple(range(channels))
+        self.mode = mode or ("RGBA" if channels == 4 else "RGB")
+        self.info = dict(info or {})
+        self.array = array
+        self.flat = array.reshape(-1, channels)
+
+    def get(self, pixels: np.ndarray, channels) -> np.ndarray:
+        return self.flat[np.asarray(pixels)[:, None], list(channels)]
+
+    def to_image(self) -> Image.Image:
+        img = Image.fromarray(self.array)
+        img.info = dict(self.info)
+        return img
+
+    def close(self):
+        pass
+
+# ------------------ Decode Cache ------------------
+
+class DecodeCache:
+    """LRU cache of decoded RGB/RGBA carrier arrays with a byte budget
+
+    Entries are keyed by (absolute path, mtime, size), so a rewritten file never
+    serves stale pixels. Each holds (array, info, format, mode): the pixels, the
+    metadata hide() copies to its output, and the file's own format and mode.
+    Cached arrays are read-only. Safe to share between threads.
+    """
+
+    def __init__(self, max_bytes: int = DECODE_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()  # key -> (array, info, format, mode), least recently used first
+        self.nbytes = 0
+        self.hits = self.misses = self.evictions = 0
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def _key(path):
+        st = os.stat(path)
+        return os.path.abspath(path), st.st_mtime_ns, st.st_size
+
+    def get(self, path) -> Optional[tuple]:
+        try:
+            key = self._key(path)
+        except OSError:
+            return None
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, path, array: np.ndarray, info: dict = None, format: str = None, mode: str = None):
+        if array.nbytes > self.max_bytes:
+            return
+        try:
+            key = self._key(path)
+        except OSError:
+            return
+        array = np.asarray(array)
+        array.setflags(write=False)
+        with self.lock:
+            # Older versions of the same file can never be hit again
+            for stale in [k for k in self.entries if k[0] == key[0]]:
+                self.nbytes -= self.entries.pop(stale)[0].nbytes
+            self.entries[key] = (array, dict(info or {}), format, mode)
+            self.nbytes += array.nbytes
+            while self.nbytes > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.nbytes -= evicted[0].nbytes
+                self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.nbytes = 0
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                    "entries": len(self.entries), "bytes": self.nbytes, "max_bytes": self.max_bytes}
+
+_decode_cache = None
+
+def enable_decode_cache(max_bytes: int = DECODE_CACHE_BYTES) -> DecodeCache:
+    """Turn on the process-wide decode cache (off by default) and return it"""
+    global _decode_cache
+    _decode_cache = DecodeCache(max_bytes)
+    return _decode_cache
+
+def disable_decode_cache():
+    global _decode_cache
+    _decode_cache = None
+
+def decode_cache_stats() -> Optional[dict]:
+    """Hit/miss/eviction counts and memory use, or None while the cache is off"""
+    return None if _decode_cache is None else _decode_cache.stats()
+
+# ------------------ Extraction Helpers ------------------
+
+def _as_carrier(carrier):
+    """Normalize a carrier for _open(): a path, a seekable in-memory file or a PIL image
+
+    NumPy arrays become images; bytes-like objects are wrapped in a BytesIO and
+    other binary file objects are read into one. A BytesIO is used as is, from
+    its start. Paths to uncompressed files become read-only memory maps, and
+    paths held in the decode cache are served from their cached array.
+    """
+    if isinstance(carrier, np.ndarray):
+        return Image.fromarray(carrier)
+    if isinstance(carrier, (bytes, bytearray, memoryview)):
+        return io.BytesIO(carrier)
+    if hasattr(carrier, 'read') and not isinstance(carrier, io.BytesIO):
+        return io.BytesIO(carrier.read())
+    if isinstance(carrier, (str, os.PathLike)):
+        # Uncompressed files are read through a memory map instead of being decoded
+        mapped = _map_carrier(carrier)
+        if mapped is not None:
+            return mapped
+        cached = _decode_cache.get(carrier) if _decode_cache is not None else None
+        if cached is not None:
+            array, info, file_format, mode = cached
+            return _ArrayCarrier(array, carrier, info, file_format, mode)
+        return carrier
+    return carrier
+
+def _open(source) -> Image.Image:
+    """Open a normalized carrier lazily; decoded images and memory maps are returned as they are"""
+    if isinstance(source, (Image.Image, _MappedCarrier)):
+        return source
+    if isinstance(source, io.BytesIO):
+        source.seek(0)
+    return Image.open(source)
+
+def _open_carrier(source) -> Image.Image:
+    """Open an image as RGB or RGBA, converting other modes"""
+    img = _open(source)
+    if img.mode not in ['RGB', 'RGBA']:
+        img = img.convert('RGBA')
+    return img
+
+_partial_png = None  # whether Pillow decodes a truncated PNG tile correctly; checked on first use
+
+def _truncate_png(img: Image.Image, rows: int) -> bool:
+    """Shrink an unloaded PNG's size and tile so the decoder stops after `rows` rows
+
+    This relies on Pillow internals (Image._size, ImageFile.tile); returns False
+    for images whose layout it does not handle.
+    """
+    if img.format != "PNG" or img.info.get("interlace") or len(img.tile) != 1 or not hasattr(img, "_size"):
+        return False
+    codec, extents, offset, args = img.tile[0]
+    if tuple(extents) != (0, 0) + img.size:
+        return False
+    # The zip decoder stops once the shrunken buffer is full
+    img._size = (img.width, rows)
+    img.tile = [(codec, (0, 0, img.width, rows), offset, args)]
+    return True
+
+def _partial_png_supported() -> bool:
+    """Check once, on a small PNG, that truncated decodes return the right rows"""
+    global _partial_png
+    if _partial_png is None:
+        rows = np.random.default_rng(0).integers(0, 256, (64, 64, 3), dtype=np.uint8)
+        buffer = io.BytesIO()
+        Image.fromarray(rows).save(buffer, format="PNG")
+        try:
+            img = Image.open(buffer)
+            if _truncate_png(img, 5):
+                img.load()
+            _partial_png = img.size == (64, 5) and np.array_equal(np.asarray(img), rows[:5])
+        except Exception:
+            _partial_png = False
+    return _partial_png
+
+def _open_rows(source, rows: int) -> Image.Image:
+    """Open an image, decoding only its first `rows` rows where the format allows
+
+    PNG files are truncated when _partial_png_supported(); anything else, or a
+    truncated decode that fails, falls back to decoding the whole image.
+    """
+    img = _open(source)
+    rows = min(rows, img.height)
+    # Caller-owned images are never truncated, only files this call opened
+    if img is not source and rows < img.height and _partial_png_supported() and _truncate_png(img, rows):
+        try:
+            img.load()
+            return img
+        except Exception:
+            img = _open(source)
+    img.load()
+    return img
+
+def _iter_lsb_blocks(source, block_pixels: int = EXTRACT_BLOCK_PIXELS):
+    """Yield the RGB LSB plane in raster order, one bounded row block at a time"""
+    width, height = _open(source).size
+    block_rows = max(1, block_pixels // max(1, width))
+    done = 0
+    rows = block_rows
+    while done < height:
+        # Decode a growing prefix of the image so early stops never pay for a full decode
+        img = _open_rows(source, rows)
         if img.mode not in ['RGB', 'RGBA']:
             img = img.convert('RGBA')
-    except Exception as e:
-        return f"Error: Cannot open image! ({e})"
+        for y in range(done, img.height, block_rows):
+            block = np.asarray(img.crop((0, y, width, min(y + block_rows, img.height))))
+            yield (block[:, :, :3] & 1).reshape(-1)
+        done = img.height
+        rows *= 2
+
+def _find_delimiter(packed: np.ndarray, limit: int) -> int:
+    """Return the bit index just past the first DELIMITER in packed bits, or -1"""
+    # 15 consecutive ones always cover one whole aligned 0xFF byte
+    full = np.flatnonzero(packed == 0xFF)
+    if not full.size:
+        return -1
+    starts = np.union1d(full - 1, full)
+    starts = starts[starts >= 0]
+    padded = np.concatenate([packed, np.zeros(2, dtype=np.uint8)]).astype(np.uint32)
+    windows = (padded[starts] << 16) | (padded[starts + 1] << 8) | padded[starts + 2]
+    best = -1
+    for shift in range(8):
+        hits = starts[((windows >> (8 - shift)) & 0xFFFF) == 0xFFFE]
+        ends = hits * 8 + shift + 16
+        ends = ends[ends <= limit]
+        if ends.size and (best < 0 or ends[0] < best):
+            best = int(ends[0])
+    return best
+
+def _extract_delimited(source, progress=None):
+    """Legacy decoder: scan packed LSB bytes block by block, stop at the delimiter"""
+    width, height = _open(source).size
+    chunks = []       # packed bytes of all bits read so far
+    carry = np.zeros(0, dtype=np.uint8)  # trailing bits not yet packed
+    tail = np.zeros(0, dtype=np.uint8)   # last packed bytes, for matches across blocks
+    n_packed = 0
+    blocks = _iter_lsb_blocks(source)
+    end = -1
+    exhausted = False
 
+    while end < 0 and not exhausted:
+        bits = next(blocks, None)
+        if bits is None:
+            exhausted = True
+            if not carry.size:
+                break
+            bits = np.zeros(0, dtype=np.uint8)
+        bits = np.concatenate([carry, bits])
+        usable = len(bits) if exhausted else len(bits) // 8 * 8
+        packed = np.packbits(bits[:usable])
+        carry = bits[usable:]
+
+        base = n_packed - len(tail)
+        window = np.concatenate([tail, packed])
+        found = _find_delimiter(window, (n_packed - base) * 8 + usable)
+        if found >= 0:
+            end = base * 8 + found
+
+        chunks.append(packed)
+        n_packed += len(packed)
+        tail = window[-2:]
+        _report(progress, n_packed * 8 / (width * height * 3), "scan")
+
+    if end < 0:
+        return None
+
+    msg_bits = end - len(DELIMITER)
+    data = np.concatenate(chunks)
+    if msg_bits % 8 == 0:
+        return data[:msg_bits // 8].tobytes().decode('latin-1')
+    binary = ''.join(map(str, np.unpackbits(data)[:msg_bits]))
+    return binary_to_message(binary)
+
+def _extract_loop(img: Image.Image):
+    """Reference legacy decoder: read LSBs pixel by pixel until the delimiter"""
     pixels = img.load()
     binary_data = ""
-    delimiter = "1111111111111110"
 
     for y in range(img.height):
         for x in range(img.width):
             r, g, b, *rest = pixels[x, y]
             for color in (r, g, b):
                 binary_data += str(color & 1)
-                if binary_data.endswith(delimiter):
-                    message_binary = binary_data[:-len(delimiter)]
-                    return "Hidden message: " + binary_to_message(message_binary)
+                if binary_data.endswith(DELIMITER):
+                    message_binary = binary_data[:-len(DELIMITER)]
+                    return binary_to_message(message_binary)
+
+    return None
+
+def _extract_legacy(source, engine: str, progress=None):
+    """Decode a delimiter-terminated payload with the selected engine"""
+    if isinstance(source, _MappedCarrier):
+        source = source.to_image()
+    if engine == "loop":
+        return _extract_loop(_open_carrier(source))
+    return _extract_delimited(source, progress)
+
+# ------------------ Results and Timing ------------------
+
+@dataclass
+class StegoResult:
+    """Outcome of hide()/extract() and their in-memory variants, with per-stage wall times in seconds"""
+    ok: bool
+    summary: str                      # the human-readable text the string API returns
+    error: Optional[str] = None
+    output_path: Optional[str] = None
+    highlight_path: Optional[str] = None
+    payload: Optional[bytes] = None
+    header: Optional[dict] = None
+    bits_embedded: int = 0
+    pixels_touched: int = 0
+    timings: dict = field(default_factory=dict)
+    image: Optional[Image.Image] = None            # stego image, from hide() and hide_image()
+    highlight_image: Optional[Image.Image] = None
+
+    @property
+    def found(self) -> bool:
+        return self.payload is not None
+
+    @property
+    def array(self) -> Optional[np.ndarray]:
+        """The stego image as a (height, width, channels) uint8 array"""
+        return None if self.image is None else np.asarray(self.image)
+
+class _StageTimer:
+    """Accumulate wall time per stage and forward each measurement to an optional hook"""
+
+    def __init__(self, hook=None):
+        self.hook = hook
+        self.timings = {}
+
+    def add(self, stage: str, seconds: float):
+        self.timings[stage] = self.timings.get(stage, 0.0) + seconds
+        if self.hook is not None:
+            self.hook(stage, seconds)
+
+    @contextmanager
+    def stage(self, name: str, exclude: tuple = ()):
+        """Time a block; time spent in nested `exclude` stages is not counted twice"""
+        before = sum(self.timings.get(s, 0.0) for s in exclude)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            nested = sum(self.timings.get(s, 0.0) for s in exclude) - before
+            self.add(name, time.perf_counter() - start - nested)
+
+    def wrap(self, name: str, iterable):
+        """Yield from an iterable, charging the time spent producing items to a stage"""
+        iterator = iter(iterable)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                self.add(name, time.perf_counter() - start)
+            yield item
+
+# ------------------ Output Writing ------------------
+
+_encoder_pool = None
+
+def _encoder() -> ThreadPoolExecutor:
+    """Shared thread pool for PNG encodes (Pillow's encoder releases the GIL)"""
+    global _encoder_pool
+    if _encoder_pool is None:
+        _encoder_pool = ThreadPoolExecutor(max_workers=ENCODE_THREADS, thread_name_prefix="stego-encode")
+    return _encoder_pool
+
+def _temp_path(path: str) -> str:
+    """Hidden sibling path for writing `path` atomically"""
+    directory, name = os.path.split(path)
+    return os.path.join(directory, f".{name}.{os.getpid()}.{threading.get_ident()}.tmp")
+
+def _encode_png(image: Image.Image, target, compress_level: int, optimize: bool) -> float:
+    """PNG-encode to a path or binary file; return seconds"""
+    start = time.perf_counter()
+    image.save(target, format="PNG", compress_level=compress_level, optimize=optimize)
+    return time.perf_counter() - start
+
+def _write_images(jobs: list, timer: _StageTimer, progress=None):
+    """Encode (stage, image, target, compress_level, optimize) jobs concurrently
+
+    Path targets are written atomically: each is encoded to a temp file, and all
+    are renamed into place once every encode is done. `progress` gets a last
+    chance to cancel before the renames; a cancel or failure removes the temp
+    files, so no output appears. Each job's encode time is recorded under its
+    stage, and the wall time for all of them under "write"; encodes overlap, so
+    the stages may add up to more.
+    """
+    start = time.perf_counter()
+    temps = [_temp_path(job[2]) if isinstance(job[2], (str, os.PathLike)) else None for job in jobs]
+    encodes = [(job[1], temp or job[2]) + job[3:] for job, temp in zip(jobs, temps)]
+    try:
+        if len(jobs) == 1:
+            seconds = [_encode_png(*encodes[0])]
+        else:
+            futures = [_encoder().submit(_encode_png, *encode) for encode in encodes]
+            wait(futures)  # never remove a temp file an encode is still writing
+            seconds = [f.result() for f in futures]
+        _report(progress, 0.95, "write")
+        for job, temp in zip(jobs, temps):
+            if temp:
+                os.replace(temp, job[2])
+    except BaseException:
+        for temp in temps:
+            if temp and os.path.exists(temp):
+                os.remove(temp)
+        raise
+    for job, spent in zip(jobs, seconds):
+        timer.add(job[0], spent)
+    timer.add("write", time.perf_counter() - start)
+
+# ------------------ Multi-Frame Carriers ------------------
+
+class _CarrierFull(Exception):
+    """Raised when a payload runs past the last frame"""
+
+def _is_multiframe(path) -> bool:
+    """True for animated GIF/PNG and multi-page TIFF files"""
+    try:
+        with Image.open(path) as img:
+            return img.format in FRAME_FORMATS and getattr(img, "n_frames", 1) > 1
+    except Exception:
+        return False
+
+def _frame_array(img: Image.Image, rgba: bool) -> np.ndarray:
+    """Decode the current frame as RGB/RGBA, always RGBA when `rgba` (APNG needs one colour type)"""
+    mode = "RGBA" if rgba or img.mode not in ('RGB', 'RGBA') else img.mode
+    return np.array(img if img.mode == mode else img.convert(mode))
+
+def _frame_info(img: Image.Image) -> dict:
+    """Timing, disposal (as an APNG dispose op) and resolution of the current frame"""
+    if img.format == "GIF":
+        disposal = {2: 1, 3: 2}.get(getattr(img, "disposal_method", 0), 0)  # background, previous
+    else:
+        disposal = img.info.get("disposal", 0)
+    compression = img.info.get("compression")
+    return {"duration": int(round(img.info.get("duration", 0))), "disposal": disposal,
+            "dpi": img.info.get("dpi"),
+            "compression": compression if compression in TIFF_LOSSLESS else "tiff_adobe_deflate"}
+
+def _frame_pixels(img: Image.Image) -> int:
+    """Pixels over all frames; only TIFF pages can differ in size, and are sized from their IFDs"""
+    if img.format != "TIFF":
+        return img.width * img.height * img.n_frames
+    total = 0
+    for index in range(img.n_frames):
+        img.seek(index)
+        total += img.width * img.height
+    img.seek(0)
+    return total
+
+def _deflate_frame(arr: np.ndarray, compress_level: int) -> bytes:
+    return zlib.compress(_filter_rows(np.zeros_like(arr[0]), arr), compress_level)
+
+def _encode_tiff_page(arr: np.ndarray, info: dict) -> bytes:
+    buffer = io.BytesIO()
+    extra = {"dpi": info["dpi"]} if info["dpi"] else {}
+    Image.fromarray(arr).save(buffer, format="TIFF", compression=info["compression"], **extra)
+    return buffer.getvalue()
+
+class _FrameWriter:
+    """Encode frames on the shared encoder threads and write them in order as they finish
+
+    At most FRAMES_IN_FLIGHT frames wait for their encode, which bounds memory.
+    """
+
+    def __init__(self, fp):
+        self.fp = fp
+        self.pending = deque()  # (future, info) in frame order
+        self.written = 0
+
+    def add(self, arr: np.ndarray, info: dict):
+        self.pending.append((_encoder().submit(self.encode, arr, info), info))
+        while len(self.pending) > FRAMES_IN_FLIGHT:
+            self._write_next()
+
+    def _write_next(self):
+        future, info = self.pending.popleft()
+        self.write(future.result(), info)
+        self.written += 1
+
+    def close(self):
+        while self.pending:
+            self._write_next()
+
+class _APNGWriter(_FrameWriter):
+    """Full-canvas APNG frames with blend OP_SOURCE, so each decodes to exactly its pixels"""
+
+    def __init__(self, fp, size: tuple, n_frames: int, loop: int, compress_level: int):
+        super().__init__(fp)
+        self.size, self.n_frames, self.loop, self.level = size, n_frames, loop, compress_level
+        self.sequence = 0
+
+    def add(self, arr: np.ndarray, info: dict):
+        if arr.shape[1::-1] != self.size:
+            raise ValueError("Frames differ in size; save as .tif to keep them")
+        if self.written == 0 and not self.pending:
+            self.fp.write(PNG_SIGNATURE)
+            color_type = 6 if arr.shape[2] == 4 else 2
+            _write_png_chunk(self.fp, b"IHDR", struct.pack(">IIBBBBB", *self.size, 8, color_type, 0, 0, 0))
+            _write_png_chunk(self.fp, b"acTL", struct.pack(">II", self.n_frames, self.loop))
+        super().add(arr, info)
+
+    def encode(self, arr: np.ndarray, info: dict) -> bytes:
+        return _deflate_frame(arr, self.level)
+
+    def write(self, data: bytes, info: dict):
+        delay, scale = info["duration"], 1000
+        if delay > 0xFFFF:
+            delay, scale = min(delay // 10, 0xFFFF), 100
+        _write_png_chunk(self.fp, b"fcTL", struct.pack(">IIIIIHHBB", self.sequence, *self.size, 0, 0,
+                                                       delay, scale, info["disposal"], 0))
+        self.sequence += 1
+        if self.written == 0:
+            _write_png_chunk(self.fp, b"IDAT", data)
+        else:
+            _write_png_chunk(self.fp, b"fdAT", struct.pack(">I", self.sequence) + data)
+            self.sequence += 1
+
+    def close(self):
+        super().close()
+        _write_png_chunk(self.fp, b"IEND", b"")
+
+class _TIFFWriter(_FrameWriter):
+    """Multi-page TIFF; each page is encoded on its own and appended with its offsets fixed up"""
+
+    def __init__(self, fp, optimize: bool = False):
+        super().__init__(fp)
+        self.tiff = TiffImagePlugin.AppendingTiffWriter(fp)
+        self.optimize = optimize
+
+    def encode(self, arr: np.ndarray, info: dict) -> bytes:
+        return _encode_tiff_page(arr, dict(info, compression="tiff_adobe_deflate") if self.optimize else info)
+
+    def write(self, data: bytes, info: dict):
+        self.tiff.write(data)
+        self.tiff.newFrame()
+
+    def close(self):
+        super().close()
+        self.tiff.finalize()
+        self.tiff.close()
+
+class _FrameCursor:
+    """Decode frames one at a time and write payload bits into them as they arrive
+
+    Bits address one pixel stream: every pixel of frame 0, then of frame 1, and so
+    on. A finished frame goes to the writer before the next one is decoded.
+    """
+
+    def __init__(self, img: Image.Image, writer: _FrameWriter, rgba: bool, timer: _StageTimer):
+        self.img, self.writer, self.rgba, self.timer = img, writer, rgba, timer
+        self.index = -1
+        self.start = self.end = 0
+        self.frame = self.info = None
+
+    def _advance(self):
+        if self.frame is not None:
+            with self.timer.stage("write"):
+                self.writer.add(self.frame, self.info)
+        self.index += 1
+        if self.index >= self.img.n_frames:
+            raise _CarrierFull()
+        with self.timer.stage("decode"):
+            self.img.seek(self.index)
+            self.frame = _frame_array(self.img, self.rgba)
+            self.info = _frame_info(self.img)
+        self.flat = self.frame.reshape(-1, self.frame.shape[2])
+        self.start, self.end = self.end, self.end + len(self.flat)
+
+    def write(self, p0: int, p1: int, bits: np.ndarray, depth: int, indices: tuple):
+        per_pixel = depth * len(indices)
+        while p0 < p1:
+            while p0 >= self.end:
+                self._advance()
+            if max(indices) >= self.flat.shape[1]:
+                raise ValueError("Image has no alpha channel")
+            stop = min(p1, self.end)
+            count = (stop - p0) * per_pixel
+            _write_lsb(self.flat[p0 - self.start:stop - self.start], bits[:count], depth, indices)
+            bits, p0 = bits[count:], stop
+
+    def finish(self):
+        """Pass the frames after the payload through unchanged"""
+        try:
+            while True:
+                self._advance()
+        except _CarrierFull:
+            pass
+
+def _read_frames_payload(source, header: dict):
+    """Read a payload that runs across frames, decoding only the frames it reaches
+
+    Returns None if a frame lacks a channel the payload uses.
+    """
+    indices = [CHANNEL_NAMES.index(c) for c in header["channels"]]
+    depth, need = header["depth"], header["length"] * 8
+    img = Image.open(source.path) if isinstance(source, _MappedCarrier) else _open(source)
+    parts, got = [], 0
+    for index in range(img.n_frames):
+        img.seek(index)
+        arr = _frame_array(img, False)
+        if max(indices) >= arr.shape[2]:
+            return None
+        flat = arr.reshape(-1, arr.shape[2])[HEADER_PIXELS if index == 0 else 0:]
+        count = min(len(flat), -(-(need - got) // (depth * len(indices))))
+        parts.append(_lsb_values(flat[:count, indices].reshape(-1), depth))
+        got += len(parts[-1])
+        if got >= need:
+            break
+    bits = np.concatenate(parts) if parts else np.zeros(0, dtype=np.uint8)
+    return np.packbits(bits[:need]).tobytes()
+
+# ------------------ Core Functions ------------------
+
+def probe(image_path):
+    """Read only the container header; return its fields, or None if no payload
+
+    Like capacity(), this takes a path or any in-memory carrier hide_image() accepts.
+    """
+    source = _as_carrier(image_path)
+    img = _open(source)
+    if img.width * img.height < HEADER_PIXELS:
+        return None
+    return _parse_header(_read_lsb_bytes(source, 0, HEADER_SIZE))
+
+def capacity(image_path, legacy: bool = False, depth: int = 1, channels: str = "RGB") -> int:
+    """Usable payload bytes for a carrier, from the file header only (no pixel decode)"""
+    if not legacy and isinstance(image_path, (str, os.PathLike)) and _is_multiframe(image_path):
+        img = Image.open(image_path)  # memory maps and cached arrays only cover the first frame
+    else:
+        img = _open(_as_carrier(image_path))
+    if not legacy and getattr(img, "format", None) in FRAME_FORMATS and getattr(img, "n_frames", 1) > 1:
+        # hide() spreads the payload over every frame; animations become RGBA
+        depth, indices = _parse_layout(depth, channels)
+        if 3 in indices and img.format == "TIFF" and img.mode == 'RGB':
+            return 0
+        return max(0, (_frame_pixels(img) - HEADER_PIXELS) * depth * len(indices) // 8)
+    return capacity_for(img.width, img.height, img.mode, legacy, depth, channels)
+
+def capacity_for(width: int, height: int, mode: str = "RGB", legacy: bool = False, depth: int = 1,
+                 channels: str = "RGB") -> int:
+    """Usable payload bytes for a carrier of this size and image mode"""
+    if legacy:
+        return max(0, (width * height * 3 - len(DELIMITER)) // 8)
+    depth, indices = _parse_layout(depth, channels)
+    if 3 in indices and mode == 'RGB':
+        return 0  # only non-RGB carriers are converted to RGBA and gain an alpha channel
+    return max(0, (width * height - HEADER_PIXELS) * depth * len(indices) // 8)
+
+def _loop_highlight(img: Image.Image, binary_msg: str, style, layout=None, scatter=None):
+    """Run the reference engine in place and return the highlight in the requested style"""
+    if style in (None, False, "full"):
+        highlight_img = _embed_loop(img, binary_msg, layout, scatter)
+        return highlight_img if style else None
+    before = np.array(img)
+    _embed_loop(img, binary_msg, layout, scatter)
+    after = np.asarray(img)
+    return _render_highlight(after, _changed_mask(before, after), style)
+
+def _hide(carrier, payload, timer: _StageTimer, engine: str, highlight, legacy: bool, progress,
+          compress, depth: int, channels: str, key) -> StegoResult:
+    """Embed into any carrier _as_carrier() accepts; the result holds the stego and highlight images"""
+
+    def fail(error: str, summary: str = None) -> StegoResult:
+        return StegoResult(False, summary or f"Error: {error}!", error=error, timings=timer.timings)
+
+    if engine not in ENGINES:
+        return fail(f"Unknown engine '{engine}'",
+                    f"Error: Unknown engine '{engine}'! (choose from {', '.join(ENGINES)})")
+    highlight = "full" if highlight is True else highlight
+    if highlight and highlight not in HIGHLIGHT_STYLES:
+        return fail(f"Unknown highlight style '{highlight}'",
+                    f"Error: Unknown highlight style '{highlight}'! (choose from {', '.join(HIGHLIGHT_STYLES)})")
+    if compress and compress != "auto" and compress not in CODECS:
+        return fail(f"Unknown codec '{compress}'",
+                    f"Error: Unknown codec '{compress}'! (choose from auto, {', '.join(CODECS)})")
+    if compress and legacy:
+        return fail("Compression needs the container format")
+    try:
+        layout = _parse_layout(depth, channels)
+    except ValueError as e:
+        return fail(str(e), f"Error: {e}!")
+    if legacy and (layout != (1, (0, 1, 2)) or key is not None):
+        return fail("Bit depth, channel selection and keys need the container format")
+
+    if legacy:
+        message = payload if isinstance(payload, str) else _as_buffer(payload).tobytes().decode('latin-1')
+        with timer.stage("pack"):
+            bits = message_to_bits(message)
+        total_bits = len(bits)
+        bit_chunks = [bits]
+        layout = None
+        n_pixels = -(-total_bits // 3)
+    else:
+        with timer.stage("compress"):
+            payload, codec = _compress_payload(_as_buffer(payload), compress)
+        flags = CODECS.get(codec, 0) | _layout_flags(*layout) | (FLAG_SCATTER if key is not None else 0)
+        total_bits = (HEADER_SIZE + len(payload)) * 8
+        n_pixels = _container_pixels(len(payload), layout[0], len(layout[1]))
+        bit_chunks = timer.wrap("pack", _iter_container_bits(payload, flags))
+
+    _report(progress, 0.0, "decode")
+    try:
+        with timer.stage("decode"):
+            source = _as_carrier(carrier)
+            img = _open(source)
+            file_format, file_mode = getattr(img, "format", None), img.mode
+            # Only the first frame is embedded here: never cache it as the whole file
+            cacheable = isinstance(source, (str, os.PathLike)) and getattr(img, "n_frames", 1) == 1
+            # Size is known from the header alone: reject before paying for a decode
+            if img.width * img.height < n_pixels:
+                return fail("Image too small to hide this message")
+            if isinstance(img, _MappedCarrier) and not img.writable:
+                img = img.to_image()  # read-only maps are only for reading
+            if not isinstance(img, _MappedCarrier):
+                img.load()
+        with timer.stage("convert"):
+            if isinstance(img, _MappedCarrier):
+                pass  # embedded in place, already RGB or RGBA
+            elif img.mode not in ['RGB', 'RGBA']:
+                img = img.convert('RGBA')
+            elif engine == "loop" and (img is source or isinstance(source, _MappedCarrier)):
+                img = img.copy()  # the reference engine writes in place; never into shared pixels
+        if cacheable and _decode_cache is not None:
+            _decode_cache.put(source, np.asarray(img), img.info, file_format, file_mode)
+    except Exception as e:
+        return fail(f"Cannot open image ({e})", f"Error: Cannot open image! ({e})")
+    if layout and 3 in layout[1] and img.mode != 'RGBA':
+        return fail("Image has no alpha channel")
+    scatter = None if legacy else _scatter_for(key, img.width * img.height)
+
+    _report(progress, 0.1, "decode")
+    with timer.stage("embed", exclude=("pack",)):
+        if engine == "loop":
+            with timer.stage("pack"):
+                if legacy:
+                    binary_msg = message_to_binary(message) + DELIMITER
+                else:
+                    container = _build_header(payload, flags) + payload.tobytes()
+                    binary_msg = ''.join(format(b, '08b') for b in container)
+            highlight_img = _loop_highlight(img, binary_msg, highlight, layout, scatter)
+        elif isinstance(img, _MappedCarrier):
+            # Last cancel point: no progress callbacks while writing, so a cancel never
+            # leaves a half-written file
+            _report(progress, 0.8, "save")
+            _embed_mapped(img, bit_chunks, total_bits, layout, scatter)
+            img, highlight_img = None, None
+        else:
+            img, highlight_img = _embed_numpy(img, bit_chunks, total_bits, highlight, progress,
+                                              layout, scatter)
+    if img is not None:
+        _report(progress, 0.8, "save")
+
+    return StegoResult(True, "Message hidden successfully!", bits_embedded=total_bits,
+                       pixels_touched=n_pixels, timings=timer.timings, image=img,
+                       highlight_image=highlight_img)
+
+def hide_image(carrier, payload, engine: str = "numpy", highlight=None, legacy: bool = False,
+               progress=None, hook=None, compress=None, depth: int = 1, channels: str = "RGB",
+               key=None, out=None, compress_level: int = PNG_COMPRESS_LEVEL,
+               optimize: bool = False) -> StegoResult:
+    """Hide a payload in an in-memory carrier and return the stego image on the result
+
+    `carrier` is a PIL image (left unmodified), a NumPy array, encoded image bytes
+    or a binary file object. The stego image is `result.image` (`result.array`
+    for NumPy); if a binary file object is given as `out`, it is also PNG-encoded
+    into it. Nothing touches the filesystem. Other options are as for hide().
+    """
+    timer = _StageTimer(hook)
+    result = _hide(carrier, payload, timer, engine, highlight, legacy, progress,
+                   compress, depth, channels, key)
+    if result.ok:
+        if out is not None:
+            _write_images([("encode", result.image, out, compress_level, optimize)], timer)
+        _report_done(progress)
+    return result
+
+def hide(image_path: str, output_path: str, payload, engine: str = "numpy", highlight=None,
+         legacy: bool = False, progress=None, hook=None, compress=None, depth: int = 1,
+         channels: str = "RGB", key=None, compress_level: int = PNG_COMPRESS_LEVEL,
+         optimize: bool = False, highlight_level: int = HIGHLIGHT_COMPRESS_LEVEL) -> StegoResult:
+    """Hide a payload and return a StegoResult with outputs, sizes and stage timings
+
+    `payload` is bytes-like, a binary file object or str (UTF-8 encoded). With
+    `legacy=True` a str is written in the old delimiter format instead.
+    `highlight` is off by default; pass "full" (red overlay, True also works),
+    "mask" (1-bit changed-pixel map) or "heatmap" (downscaled change density).
+    `progress(fraction, stage)` is called as work proceeds; raising
+    OperationCancelled from it aborts before anything is written.
+    `hook(stage, seconds)` receives every stage timing as it is measured.
+    `compress` is None (store raw), a codec name from CODECS, or "auto" to use
+    whichever codec does best on a 64 KiB sample; extraction undoes it transparently.
+    `depth` (1-4) bits are written into each of `channels` ("RGB", "RGBA", "B", ...)
+    per pixel; both are recorded in the header, so extraction needs no settings.
+    With a `key` (str or bytes) the payload pixels are scattered over the whole
+    image in a keyed order, and the same key is needed to extract.
+    Uncompressed BMP, PPM, TIFF and NPY carriers written to a path with their own
+    extension go through hide_in_place() instead of being re-encoded as PNG.
+    Animated GIF/PNG and multi-page TIFF carriers go through hide_frames(), which
+    takes neither `legacy` nor `highlight`.
+    The PNG output uses `compress_level` (0-9) and `optimize`, the highlight map
+    `highlight_level`; both are encoded concurrently and written atomically
+    (temp file, then rename), and `timings["write"]` is their total wall time.
+    """
+    timer = _StageTimer(hook)
+
+    def fail(error: str, summary: str = None) -> StegoResult:
+        return StegoResult(False, summary or f"Error: {error}!", error=error, timings=timer.timings)
+
+    if not os.path.exists(image_path):
+        return fail("Input image not found")
+    if engine not in ENGINES:
+        return fail(f"Unknown engine '{engine}'",
+                    f"Error: Unknown engine '{engine}'! (choose from {', '.join(ENGINES)})")
+    if highlight not in (None, False, True) and highlight not in HIGHLIGHT_STYLES:
+        return fail(f"Unknown highlight style '{highlight}'",
+                    f"Error: Unknown highlight style '{highlight}'! (choose from {', '.join(HIGHLIGHT_STYLES)})")
+
+    # Animations and multi-page files keep every frame, and the payload may use them all
+    if _is_multiframe(image_path):
+        if legacy:
+            return fail("The legacy format cannot span frames; drop legacy to keep every frame")
+        if highlight:
+            return fail("Highlights are not supported for multi-frame carriers")
+        return hide_frames(image_path, output_path, payload, progress, hook, compress, depth, channels,
+                           key, compress_level, optimize)
+
+    # Uncompressed carriers saved under their own extension skip the decode and PNG encode
+    same_format = os.path.splitext(output_path)[1].lower() == os.path.splitext(image_path)[1].lower()
+    if same_format and engine == "numpy" and not highlight and not legacy and _raw_layout(image_path):
+        return hide_in_place(image_path, payload, output_path, progress, hook, compress, depth,
+                             channels, key)
+
+    # Ensure output path ends with .png
+    if not output_path.lower().endswith(".png"):
+        output_path += ".png"
+
+    result = _hide(image_path, payload, timer, engine, highlight, legacy, progress,
+                   compress, depth, channels, key)
+    if not result.ok:
+        return result
+    jobs = [("encode", result.image, output_path, compress_level, optimize)]
+    if result.highlight_image is not None:
+        # highlight map goes next to the output, not into the working directory
+        directory, name = os.path.split(output_path)
+        result.highlight_path = os.path.join(directory, f"highlight_{name}")
+        jobs.append(("encode_highlight", result.highlight_image, result.highlight_path, highlight_level, False))
+    _write_images(jobs, timer, progress)
+    if _decode_cache is not None:
+        # The usual next step is extracting from it
+        _decode_cache.put(output_path, result.array, result.image.info, "PNG", result.image.mode)
+    result.output_path = output_path
+    result.summary += f"\nSaved as: {output_path}"
+    if result.highlight_path:
+        result.summary += f"\nHighlighted pixels: {result.highlight_path}"
+    _report_done(progress)
+    return result
+
+def hide_in_place(image_path: str, payload, output_path: str = None, progress=None, hook=None,
+                  compress=None, depth: int = 1, channels: str = "RGB", key=None) -> StegoResult:
+    """Embed directly into an uncompressed BMP, PPM, TIFF or NPY file through a memory map
+
+    Only the bytes that hold payload bits are read and written: nothing is
+    decoded or re-encoded, and row padding and bottom-up rows are handled.
+    With `output_path` the file is copied to a temp file first and renamed into
+    place once the payload is in; otherwise the carrier itself is modified.
+    Only the first page of a multi-page TIFF is used; hide() sends those to
+    hide_frames() instead. Other options are as for hide(); no highlight is made.
+    """
+    timer = _StageTimer(hook)
+
+    def fail(error: str) -> StegoResult:
+        return StegoResult(False, f"Error: {error}!", error=error, timings=timer.timings)
+
+    if not os.path.exists(image_path):
+        return fail("Input image not found")
+    if _raw_layout(image_path) is None:
+        return fail("Image format cannot be embedded in place")
+
+    target = image_path
+    if output_path is not None:
+        target = _temp_path(output_path)
+        with timer.stage("copy"):
+            shutil.copyfile(image_path, target)
+    carrier = _map_carrier(target, writable=True)
+    ok = False
+    try:
+        result = _hide(carrier, payload, timer, "numpy", None, False, progress, compress, depth,
+                       channels, key)
+        ok = result.ok
+    finally:
+        with timer.stage("flush"):
+            carrier.close()
+        if not ok and target != image_path:
+            os.remove(target)  # never leave a copy behind that holds no payload
+    if not ok:
+        return result
+    if target != image_path:
+        os.replace(target, output_path)
+        target = output_path
+    timer.add("write", timer.timings.get("copy", 0.0) + timer.timings["flush"])
+    result.output_path = target
+    result.summary += f"\nSaved as: {target}"
+    _report_done(progress)
+    return result
+
+def hide_frames(image_path: str, output_path: str, payload, progress=None, hook=None, compress=None,
+                depth: int = 1, channels: str = "RGB", key=None,
+                compress_level: int = PNG_COMPRESS_LEVEL, optimize: bool = False) -> StegoResult:
+    """Hide a payload across every frame of an animated GIF/PNG or multi-page TIFF
+
+    The payload runs on from frame to frame, with the container header at the
+    start of the first. Frames are decoded one at a time. Finished frames are
+    encoded on the shared encoder threads while later frames are embedded, so
+    the animation is never held in memory whole. The output is an APNG of full
+    RGBA frames that keeps each frame's duration and disposal and the loop count.
+    An output path ending in .tif/.tiff is written as a multi-page TIFF instead.
+    `optimize` deflates APNG frames at level 9 and every TIFF page with Adobe Deflate.
+    hide() sends multi-frame carriers here; keys and highlights are not supported.
+    """
+    timer = _StageTimer(hook)
+
+    def fail(error: str, summary: str = None) -> StegoResult:
+        return StegoResult(False, summary or f"Error: {error}!", error=error, timings=timer.timings)
+
+    if not os.path.exists(image_path):
+        return fail("Input image not found")
+    if key is not None:
+        return fail("Keys are not supported for multi-frame carriers")
+    if compress and compress != "auto" and compress not in CODECS:
+        return fail(f"Unknown codec '{compress}'",
+                    f"Error: Unknown codec '{compress}'! (choose from auto, {', '.join(CODECS)})")
+    try:
+        layout = _parse_layout(depth, channels)
+    except ValueError as e:
+        return fail(str(e), f"Error: {e}!")
+    tiff = output_path.lower().endswith((".tif", ".tiff"))
+    if not tiff and not output_path.lower().endswith(".png"):
+        output_path += ".png"
+
+    with timer.stage("compress"):
+        payload, codec = _compress_payload(_as_buffer(payload), compress)
+    flags = CODECS.get(codec, 0) | _layout_flags(*layout) | FLAG_FRAMES
+    total_bits = (HEADER_SIZE + len(payload)) * 8
+    bit_chunks = timer.wrap("pack", _iter_container_bits(payload, flags))
+
+    temp = _temp_path(output_path)
+    try:
+        with Image.open(image_path) as img, open(temp, "w+b") as fp:
+            n_frames = getattr(img, "n_frames", 1)
+            if img.width * img.height < HEADER_PIXELS:
+                raise _CarrierFull()
+            writer = _TIFFWriter(fp, optimize) if tiff else _APNGWriter(
+                fp, img.size, n_frames, img.info.get("loop", 1), 9 if optimize else compress_level)
+            cursor = _FrameCursor(img, writer, not tiff, timer)
+            _report(progress, 0.1, "decode")
+            with timer.stage("embed", exclude=("pack", "decode", "write")):
+                _embed_chunks(bit_chunks, total_bits, cursor.write, layout, progress)
+            used = cursor.index + 1
+            _report(progress, 0.8, "save")
+            cursor.finish()
+            with timer.stage("write"):
+                writer.close()
+        _report(progress, 0.95, "write")
+        os.replace(temp, output_path)
+    except _CarrierFull:
+        return fail("Image too small to hide this message")
+    except OperationCancelled:
+        raise
+    except ValueError as e:
+        return fail(str(e))
+    except Exception as e:
+        return fail(f"Cannot open image ({e})", f"Error: Cannot open image! ({e})")
+    finally:
+        if os.path.exists(temp):
+            os.remove(temp)
+    _report_done(progress)
+    return StegoResult(True, f"Message hidden successfully!\nFrames used: {used} of {n_frames}"
+                             f"\nSaved as: {output_path}", output_path=output_path, bits_embedded=total_bits,
+                       pixels_touched=_container_pixels(len(payload), layout[0], len(layout[1])),
+                       timings=timer.timings)
+
+def hide_bytes(image_path: str, output_path: str, payload, engine: str = "numpy",
+               highlight=None, progress=None, compress=None, depth: int = 1, channels: str = "RGB",
+               key=None) -> str:
+    """Hide a bytes, memoryview or binary file payload in an image (text is UTF-8 encoded)"""
+    return hide(image_path, output_path, payload, engine, highlight, progress=progress,
+                compress=compress, depth=depth, channels=channels, key=key).summary
+
+STREAM_CHILD = """
+import pickle, sys, stego
+try:
+    reply = True, stego._stream_job(pickle.load(sys.stdin.buffer))
+except Exception as e:
+    reply = False, e
+pickle.dump(reply, sys.stdout.buffer)
+"""
+
+def _stream_job(job: tuple) -> dict:
+    """Worker entry point for hide_bytes_streaming(): run one streaming hide and measure its memory"""
+    image_path, output_path, payload, strip_rows, compress_level = job
+    payload = _as_buffer(payload)
+    tracemalloc.start()
+    try:
+        stats = _stream_embed(image_path, output_path, payload, strip_rows, compress_level)
+        if stats is None:
+            result = hide(image_path, output_path, payload)
+            if not result.ok:
+                raise ValueError(result.error)
+            stats = {"output": output_path, "streamed": False}
+        else:
+            stats["streamed"] = True
+        stats["peak_traced_bytes"] = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    stats["peak_rss_bytes"] = _peak_rss()
+    return stats
+
+def hide_bytes_streaming(image_path: str, output_path: str, payload, strip_rows: int = STRIP_ROWS,
+                         compress_level: int = 6) -> dict:
+    """Hide a payload with memory bounded by strip size; return stats including peak memory
+
+    8-bit RGB/RGBA PNG carriers are processed strip by strip and never fully decoded.
+    Other carriers fall back to hide(), and the stats report `streamed: False`.
+    No highlight image is written in this mode. The work runs in a fresh child
+    process, so `peak_rss_bytes` is this call's peak (plus the interpreter's own
+    footprint) rather than the caller's lifetime peak; `peak_traced_bytes` counts
+    Python allocations only.
+    """
+    if not output_path.lower().endswith(".png"):
+        output_path += ".png"
+    job = (image_path, output_path, bytes(_as_buffer(payload)), strip_rows, compress_level)
+    if resource is None:
+        return _stream_job(job)  # no peak RSS on this platform, so nothing to isolate
+    # A fresh interpreter (not a fork, whose RSS starts at the caller's) runs the job
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(
+        filter(None, [os.path.dirname(os.path.abspath(__file__)), os.environ.get("PYTHONPATH")])))
+    child = subprocess.run([sys.executable, "-c", STREAM_CHILD], input=pickle.dumps(job),
+                           capture_output=True, env=env)
+    if child.returncode != 0:
+        raise RuntimeError(f"Streaming worker failed: {child.stderr.decode(errors='replace').strip()}")
+    ok, value = pickle.loads(child.stdout)
+    if not ok:
+        raise value
+    return value
+
+def hide_message(image_path: str, output_path: str, message: str, engine: str = "numpy",
+                 legacy: bool = False, highlight=None, progress=None, compress=None,
+                 depth: int = 1, channels: str = "RGB", key=None) -> str:
+    """Hide a text message in an image using LSB steganography"""
+    payload = message if legacy else message.encode('utf-8')
+    return hide(image_path, output_path, payload, engine, highlight, legacy, progress,
+                compress=compress, depth=depth, channels=channels, key=key).summary
+
+def extract_image(carrier, engine: str = "numpy", progress=None, hook=None, key=None) -> StegoResult:
+    """Extract a payload from an in-memory carrier (PIL image, NumPy array, bytes or file object)
+
+    Encoded carriers are decoded only as far as the payload reaches, as for files.
+    """
+    timer = _StageTimer(hook)
+
+    def fail(error: str, summary: str = None) -> StegoResult:
+        return StegoResult(False, summary or f"Error: {error}!", error=error, timings=timer.timings)
+
+    if engine not in ENGINES:
+        return fail(f"Unknown engine '{engine}'",
+                    f"Error: Unknown engine '{engine}'! (choose from {', '.join(ENGINES)})")
+
+    _report(progress, 0.0, "probe")
+    try:
+        with timer.stage("probe"):
+            source = _as_carrier(carrier)
+            header = probe(source)
+    except Exception as e:
+        return fail(f"Cannot open image ({e})", f"Error: Cannot open image! ({e})")
+
+    if header is None:
+        # No container header: fall back to the legacy delimiter format
+        with timer.stage("read"):
+            message = _extract_legacy(source, engine, progress)
+        _report_done(progress)
+        if message is None:
+            return StegoResult(True, "No hidden message found!", timings=timer.timings)
+        payload = message.encode('latin-1', errors='replace')
+        bits = sum(max(8, ord(c).bit_length()) for c in message) + len(DELIMITER)
+        return StegoResult(True, "Hidden message: " + message, payload=payload,
+                           bits_embedded=bits, pixels_touched=-(-bits // 3), timings=timer.timings)
+
+    if header["frames"]:
+        _report(progress, 0.1, "read")
+        with timer.stage("read"):
+            payload = _read_frames_payload(source, header)
+        if payload is not None and len(payload) < header["length"]:
+            return fail("Hidden message is truncated")
+    else:
+        width, height = _open(source).size
+        if width * height < header["pixels"]:
+            return fail("Hidden message is truncated")
+        if header["scattered"] and key is None:
+            return fail("Hidden message is scattered; a key is needed")
+        scatter = _scatter_for(key, width * height) if header["scattered"] else None
+        _report(progress, 0.1, "read")
+        with timer.stage("read"):
+            payload = _read_payload(source, header, scatter)
+    if payload is None:
+        return fail("Image has no alpha channel for the hidden message")
+    with timer.stage("verify"):
+        intact = zlib.crc32(payload) == header["checksum"]
+    if not intact:
+        return fail("Hidden message is corrupted (checksum mismatch)")
+    bits = (HEADER_SIZE + len(payload)) * 8
+    if header["codec"]:
+        try:
+            with timer.stage("decompress"):
+                payload = _decompress(payload, header["codec"])
+        except Exception as e:
+            return fail(f"Hidden message is corrupted (cannot decompress: {e})")
+    _report_done(progress)
+
+    return StegoResult(True, "Hidden message: " + payload.decode('utf-8', errors='replace'),
+                       payload=payload, header=header, bits_embedded=bits,
+                       pixels_touched=header["pixels"], timings=timer.timings)
+
+def extract(image_path: str, engine: str = "numpy", progress=None, hook=None, key=None) -> StegoResult:
+    """Extract a payload and return a StegoResult with the bytes, header and stage timings
+
+    `key` is only needed (and only used) for payloads hidden in scatter mode.
+    """
+    if not os.path.exists(image_path):
+        return StegoResult(False, "Error: Image not found!", error="Image not found")
+    return extract_image(image_path, engine, progress, hook, key)
+
+def extract_bytes(image_path: str, engine: str = "numpy", out=None, progress=None, key=None):
+    """Return the hidden payload as bytes, or None if the image holds no payload
+
+    If a binary file object is given as `out`, the payload is written to it instead
+    and the number of bytes written is returned. Failures raise ValueError.
+    """
+    result = extract(image_path, engine, progress, key=key)
+    if not result.ok:
+        raise ValueError(result.error)
+    if out is not None and result.payload is not None:
+        return out.write(result.payload)
+    return result.payload
+
+def extract_message(image_path: str, engine: str = "numpy", progress=None, key=None) -> str:
+    """Extract hidden message from an image"""
+    return extract(image_path, engine, progress, key=key).summary
+
+# ------------------ Steganalysis ------------------
+
+def _scan_sample(source, pixels: int) -> np.ndarray:
+    """The first rows of a carrier holding about `pixels` pixels, as an (rows, width, 3) array
+
+    Rows are never resampled: scaling would average away the very LSB statistics under test.
+    """
+    img = _open(source)
+    rows = max(1, min(img.height, -(-pixels // img.width)))
+    if isinstance(img, _MappedCarrier):
+        return img.get(np.arange(rows * img.width), (0, 1, 2)).reshape(rows, img.width, 3)
+    img = _open_rows(source, rows)
+    if img.mode not in ['RGB', 'RGBA']:
+        img = img.convert('RGBA')
+    return np.asarray(img)[:rows, :, :3]
+
+def _scan_signature(sample: np.ndarray):
+    """Return ("container", header), ("legacy", text length) or (None, None) from the sample's LSBs"""
+    packed = np.packbits(sample & 1)
+    header = _parse_header(packed[:HEADER_SIZE].tobytes())
+    if header is not None:
+        return "container", header
+    end = _find_delimiter(packed, packed.size * 8)
+    if end > len(DELIMITER) and (end - len(DELIMITER)) % 8 == 0:
+        text = packed[:(end - len(DELIMITER)) // 8]
+        printable = np.count_nonzero(((text >= 0x20) & (text < 0x7F)) | np.isin(text, (9, 10, 13)))
+        # Natural LSBs hit the delimiter by chance every ~64 kbit, but not after readable text
+        if printable >= 0.9 * text.size:
+            return "legacy", int(text.size)
+    return None, None
+
+def _chi_square_p(chi: float, dof: int) -> float:
+    """Upper tail of the chi-square distribution (Wilson-Hilferty approximation)"""
+    if dof <= 0:
+        return 0.0
+    scale = 2 / (9 * dof)
+    z = ((chi / dof) ** (1 / 3) - 1 + scale) / math.sqrt(scale)
+    return 0.5 * math.erfc(z / math.sqrt(2))
+
+def _chi_square_head(head: np.ndarray) -> float:
+    """Westfeld-Pfitzmann pairs-of-values test on some rows; p near 1 means their LSBs look randomized
+
+    Full LSB embedding evens out the counts of each value pair (2k, 2k+1).
+    """
+    hist = np.stack([np.bincount(head[..., c].reshape(-1), minlength=256) for c in range(3)])
+    hist = hist.reshape(3, 128, 2).astype(np.float64)
+    expected = hist.sum(axis=2) / 2
+    used = expected > 4  # the test is unreliable on sparsely populated pairs
+    chi = float(((hist[..., 0][used] - expected[used]) ** 2 / expected[used]).sum())
+    return _chi_square_p(chi, int(used.sum()) - 1)
+
+def _sample_pair_counts(sample: np.ndarray, band_starts: np.ndarray) -> np.ndarray:
+    """Sample pair analysis counts X, Y, Z, W and pairs (rows) per band of rows (columns)
+
+    Horizontally adjacent values are counted by how LSB flipping moves them between
+    trace sets. Pairs touching 0-1 or 254-255 are left out: flips keep values
+    within those, and clipped highlights and shadows there break the |X| = |Y|
+    assumption of natural images that SPA rests on.
+    """
+    u = sample[:, :-1].astype(np.int16)
+    v = sample[:, 1:].astype(np.int16)
+    kept = ((u >> 1) % 127 != 0) & ((v >> 1) % 127 != 0)
+    even = (v & 1) == 0
+
+    def count(mask):
+        return np.add.reduceat(np.count_nonzero(mask & kept, axis=(1, 2)), band_starts)
+
+    return np.stack([count(np.where(even, u < v, u > v)), count(np.where(even, u > v, u < v)),
+                     count(u == v), count(((u >> 1) == (v >> 1)) & (u != v)), count(kept)]).astype(np.float64)
+
+def _sample_pair_rate(x: float, y: float, z: float, w: float, pairs: float) -> float:
+    """Solve the SPA quadratic (Dumitrescu et al.) for the fraction of LSBs carrying a payload
+
+    Left unclamped, so that estimates from clean bands scatter around zero on both sides.
+    """
+    a, b, c = (w + z) / 2, 2 * x - pairs, y - x
+    if a <= 0:
+        return 0.0
+    disc = max(b * b - 4 * a * c, 0.0)  # rounding pushes full embedding slightly below zero
+    return (-b - math.sqrt(disc)) / (2 * a)
+
+def scan_image(carrier, sample_pixels: int = SCAN_PIXELS) -> dict:
+    """Triage one carrier for LSB payloads without extracting anything; return a report dict
+
+    Looks for this project's container header and legacy delimiter, then estimates the
+    embedding rate with sample pair analysis over the first `sample_pixels` pixels,
+    where sequential payloads start and scattered ones are spread as densely as
+    anywhere. The score is a lower bound on that rate, from the pooled estimate less
+    twice its standard error across row bands, or from a top band that stands out
+    from the rest and fails the chi-square attack. The pooled estimate is ignored on
+    images too noisy for SPA, where few neighbours share a value pair. Takes a path
+    or any in-memory carrier hide_image() accepts.
+    """
+    start = time.perf_counter()
+    source = _as_carrier(carrier)
+    img = _open(source)
+    report = {"format": getattr(img, "format", None), "width": img.width, "height": img.height}
+    if report["format"] in LOSSY_FORMATS:
+        report.update(verdict="lossy", score=0.0, seconds=round(time.perf_counter() - start, 6))
+        return report
+
+    sample = _scan_sample(source, sample_pixels)
+    signature, detail = _scan_signature(sample)
+    rows = sample.shape[0]
+    bands = min(SCAN_BANDS, rows)
+    spa = spa_error = close = head_rate = head = chi = 0.0
+    # Palette colours come from quantization, so their LSBs follow no natural statistics
+    if img.width > 1 and bands > 2 and img.mode != "P":
+        starts = np.arange(bands) * rows // bands
+        counts = _sample_pair_counts(sample, starts)
+        rates = np.array([_sample_pair_rate(*band) for band in counts.T])
+        x, y, z, w, pairs = counts.sum(axis=1)
+        spa = float(_sample_pair_rate(x, y, z, w, pairs))
+        close = float((z + w) / pairs) if pairs else 0.0
+        spa_error = float(rates.std(ddof=1)) / math.sqrt(bands)
+        # A sequential payload fills the top band first: it has to stand out from the
+        # other bands by more than their own spread, and the chi-square attack must agree
+        rest = rates[1:]
+        spread = 1.4826 * float(np.median(np.abs(rest - np.median(rest))))
+        head_rate = float(rates[0])
+        chi = _chi_square_head(sample[:starts[1]])
+        head = min(head_rate - float(np.median(rest)) - 3 * spread, chi)
+
+    if signature:
+        verdict, score = "payload", 1.0
+    else:
+        # Lower bounds on the embedding rate, so chance alone stays under the threshold
+        pooled = spa - 2 * spa_error if close >= SCAN_MIN_CLOSE_PAIRS else 0.0
+        score = min(max(pooled, head, 0.0), 1.0)
+        verdict = "suspicious" if score >= SCAN_THRESHOLD else "clean"
+    report.update(verdict=verdict, score=round(score, 4), signature=signature,
+                  spa=round(min(max(spa, 0.0), 1.0), 4), spa_error=round(spa_error, 4),
+                  close_pairs=round(close, 4), head_rate=round(min(max(head_rate, 0.0), 1.0), 4),
+                  chi_square=round(chi, 4), sampled_pixels=int(rows * img.width))
+    if signature == "container":
+        report["header"] = detail
+    elif signature == "legacy":
+        report["message_bytes"] = detail
+    report["seconds"] = round(time.perf_counter() - start, 6)
+    return report
+
+def _scan_job(job: tuple) -> dict:
+    """Worker entry point: scan one file, turning failures into an error record"""
+    path, sample_pixels = job
+    try:
+        return {"input": path, "status": "ok", **scan_image(path, sample_pixels)}
+    except Exception as e:
+        return {"input": path, "status": "error", "error": str(e)}
+
+def scan(image_paths, workers: int = None, sample_pixels: int = SCAN_PIXELS) -> list:
+    """Scan many files in a process pool; return their reports, most suspicious first
+
+    Found signatures rank above statistical suspicion; unreadable files come last.
+    """
+    paths = list(image_paths)
+    workers = max(1, workers or os.cpu_count() or 1)
+    jobs = [(path, sample_pixels) for path in paths]
+    if workers == 1 or len(jobs) < 2:
+        reports = list(map(_scan_job, jobs))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            reports = list(pool.map(_scan_job, jobs, chunksize=max(1, len(jobs) // (8 * workers))))
+    return sorted(reports, key=lambda r: (r["status"] != "ok", not r.get("signature"), -r.get("score", 0),
+                                          r["input"]))
+
+# ------------------ Sharding ------------------
+
+@dataclass
+class ShardReport:
+    """Outcome of extract_sharded(): the reassembled payload, or what is missing"""
+    ok: bool
+    summary: str
+    error: Optional[str] = None
+    payload: Optional[bytes] = None
+    count: int = 0                                # shards the payload was split into
+    shards: dict = field(default_factory=dict)    # shard index -> carrier it was read from
+    missing: list = field(default_factory=list)   # output names of carriers not among the inputs
+    errors: dict = field(default_factory=dict)    # carrier -> why it gave no usable shard
+
+def _payload_digest(payload) -> bytes:
+    return hashlib.blake2b(payload, digest_size=16, person=b"stego-shards").digest()
+
+def _hide_shard(job: tuple) -> StegoResult:
+    """Worker entry point: embed one shard; images are dropped so only the outcome is pickled back"""
+    path, output, shard, options = job
+    result = hide(path, output, shard, **options)
+    result.image = result.highlight_image = None
+    return result
+
+def _extract_shard(job: tuple) -> tuple:
+    """Worker entry point: return (path, shard bytes or None, error)"""
+    path, key = job
+    result = extract(path, key=key)
+    if not result.ok:
+        return path, None, result.error
+    if result.payload is None or result.payload[:len(SHARD_MAGIC)] != SHARD_MAGIC \
+            or len(result.payload) < SHARD_HEADER_SIZE:
+        return path, None, "No shard found"
+    return path, result.payload, None
+
+def hide_sharded(image_paths, output_dir: str, payload, workers: int = None, compress=None,
+                 depth: int = 1, channels: str = "RGB", key=None, compress_level: int = PNG_COMPRESS_LEVEL,
+                 optimize: bool = False) -> list:
+    """Split one payload over several carriers, embedded in parallel; return a StegoResult per carrier
+
+    Each carrier gets one ordered shard, sized in proportion to its capacity and
+    written to <output_dir>/<carrier stem>.png. A shard records the payload
+    digest, its place in the payload and the names of all outputs. With that,
+    extract_sharded() can reassemble shards in any order and name the carriers
+    that are missing. `compress` applies to the whole payload. The other
+    options work as in hide(). Raises ValueError if the carriers cannot hold
+    the payload between them.
+    """
+    paths = list(image_paths)
+    if not paths:
+        raise ValueError("No carriers given")
+    if len(paths) > 0xFFFF:
+        raise ValueError("At most 65535 carriers per payload")
+    outputs = [os.path.join(output_dir, os.path.splitext(os.path.basename(p))[0] + ".png") for p in paths]
+    if len(set(outputs)) < len(outputs):
+        raise ValueError("Carriers must have distinct file names")
+    _parse_layout(depth, channels)
+
+    buffer = _as_buffer(payload)
+    stored, codec = _compress_payload(buffer, compress)
+    manifest = "\n".join(os.path.basename(o) for o in outputs).encode('utf-8')
+    overhead = SHARD_HEADER_SIZE + len(manifest)
+    rooms = []
+    for path in paths:
+        try:
+            rooms.append(capacity(path, depth=depth, channels=channels) - overhead)
+        except Exception as e:
+            raise ValueError(f"Cannot open image {path} ({e})")
+    if min(rooms) < 0:
+        raise ValueError("Carriers too small for a shard header: "
+                         + ", ".join(p for p, room in zip(paths, rooms) if room < 0))
+    total = sum(rooms)
+    if len(stored) > total:
+        raise ValueError(f"Carriers too small: the payload needs {len(stored)} bytes, they hold {total}")
+
+    # Shares proportional to capacity keep every carrier equally full; rounding leftovers go first come
+    sizes = [len(stored) * room // total if total else 0 for room in rooms]
+    left = len(stored) - sum(sizes)
+    for i, room in enumerate(rooms):
+        extra = min(left, room - sizes[i])
+        sizes[i] += extra
+        left -= extra
+
+    digest = _payload_digest(buffer)
+    options = {"depth": depth, "channels": channels, "key": key, "compress_level": compress_level,
+               "optimize": optimize}
+    jobs, offset = [], 0
+    for index, (path, output, size) in enumerate(zip(paths, outputs, sizes)):
+        header = struct.pack(SHARD_FORMAT, SHARD_MAGIC, digest, index, len(paths), offset, len(stored),
+                             CODECS.get(codec, 0), len(manifest))
+        jobs.append((path, output, header + manifest + stored[offset:offset + size], options))
+        offset += size
+    os.makedirs(output_dir, exist_ok=True)
+    with ProcessPoolExecutor(max_workers=min(len(jobs), workers or os.cpu_count() or 1)) as pool:
+        return list(pool.map(_hide_shard, jobs))
+
+def extract_sharded(image_paths, key=None, workers: int = None) -> ShardReport:
+    """Read shards from carriers in any order, in parallel, and reassemble the payload
+
+    Each shard is verified by its container checksum, and the whole payload by
+    its digest. Carriers that hold no shard, or a shard of another payload,
+    are listed in `errors`. Carriers whose shard was not found are listed in
+    `missing`.
+    """
+    paths = list(image_paths)
+    if not paths:
+        return ShardReport(False, "Error: No carriers given!", error="No carriers given")
+    with ProcessPoolExecutor(max_workers=min(len(paths), workers or os.cpu_count() or 1)) as pool:
+        found = list(pool.map(_extract_shard, [(path, key) for path in paths]))
+
+    sets, errors = {}, {}  # payload digest -> {index: (path, fields, manifest, data)}
+    for path, blob, error in found:
+        if error:
+            errors[path] = error
+            continue
+        fields = struct.unpack_from(SHARD_FORMAT, blob)
+        _, digest, index, count, offset, length, codec, manifest_size = fields
+        shards = sets.setdefault(digest, {})
+        if index in shards:
+            errors[path] = f"Duplicate of shard {index} from {shards[index][0]}"
+            continue
+        manifest_end = SHARD_HEADER_SIZE + manifest_size
+        shards[index] = (path, fields, blob[SHARD_HEADER_SIZE:manifest_end], blob[manifest_end:])
+    if not sets:
+        return ShardReport(False, "Error: No shards found!", error="No shards found", errors=errors)
+
+    # Stray shards of other payloads do not stop the best-represented one from assembling
+    digest = max(sets, key=lambda d: len(sets[d]))
+    for other, shards in sets.items():
+        if other != digest:
+            errors.update((shard[0], "Shard of a different payload") for shard in shards.values())
+    shards = sets[digest]
+    _, fields, manifest, _ = next(iter(shards.values()))
+    count, length, codec_id = fields[3], fields[5], fields[6]
+    names = manifest.decode('utf-8', errors='replace').split("\n")
+    report = ShardReport(False, "", count=count, errors=errors,
+                         shards={i: shards[i][0] for i in sorted(shards)},
+                         missing=[names[i] if i < len(names) else f"shard {i}" for i in range(count)
+                                  if i not in shards])
+
+    def fail(error: str) -> ShardReport:
+        report.error, report.summary = error, f"Error: {error}!"
+        return report
+
+    if report.missing:
+        return fail(f"{len(report.missing)} of {count} carriers missing: {', '.join(report.missing)}")
+    offset = 0
+    for i in range(count):
+        if shards[i][1][4] != offset:
+            return fail("Shards do not line up")
+        offset += len(shards[i][3])
+    if offset != length:
+        return fail("Shards do not line up")
+    stored = b"".join(shards[i][3] for i in range(count))
+    codec = next((name for name, cid in CODECS.items() if cid == codec_id), None)
+    try:
+        payload = _decompress(stored, codec) if codec else stored
+    except Exception as e:
+        return fail(f"Reassembled payload is corrupted (cannot decompress: {e})")
+    if _payload_digest(payload) != digest:
+        return fail("Reassembled payload is corrupted (digest mismatch)")
+    report.ok, report.payload = True, payload
+    report.summary = f"Reassembled {len(payload)} bytes from {count} carriers"
+    return report
+
+# ------------------ Command Line ------------------
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp", ".gif", ".tif", ".tiff", ".ppm", ".npy")
+
+def _collect_inputs(patterns, manifest=None) -> list:
+    """Expand directories, globs and a manifest file into a sorted, de-duplicated path list"""
+    if manifest:
+        with open(manifest, encoding='utf-8') as fp:
+            patterns = list(patterns) + [line.strip() for line in fp
+                                         if line.strip() and not line.startswith('#')]
+    paths = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            for dirpath, _, filenames in os.walk(pattern):
+                paths.update(os.path.join(dirpath, name) for name in filenames
+                             if name.lower().endswith(IMAGE_EXTENSIONS))
+        elif glob.has_magic(pattern):
+            paths.update(p for p in glob.glob(pattern, recursive=True) if os.path.isfile(p))
+        else:
+            paths.add(pattern)
+    return sorted(os.path.normpath(p) for p in paths)
+
+def _output_paths(paths: list, out_dir: str, extension: str) -> tuple:
+    """Map each input to <out_dir>/<its directory below the inputs' common root>/<stem><extension>
+
+    Returns (outputs, collisions): inputs whose output an earlier input already
+    claims (same stem, different extension) map to that earlier input instead.
+    """
+    directories = [os.path.dirname(os.path.abspath(p)) for p in paths]
+    try:
+        root = os.path.commonpath(directories)
+    except ValueError:
+        root = None  # inputs on different drives: keep their full directory paths
+    outputs, claimed, collisions = {}, {}, {}
+    for path, directory in zip(paths, directories):
+        relative = os.path.relpath(directory, root) if root else os.path.splitdrive(directory)[1].lstrip(os.sep)
+        stem = os.path.splitext(os.path.basename(path))[0]
+        output = os.path.normpath(os.path.join(out_dir, relative, stem + extension))
+        owner = claimed.setdefault(os.path.normcase(output), path)
+        if owner == path:
+            outputs[path] = output
+        else:
+            collisions[path] = owner
+    return outputs, collisions
+
+def _load_journal(log_path: str) -> set:
+    """Return the inputs a previous run already finished successfully"""
+    done = set()
+    if log_path and os.path.exists(log_path):
+        with open(log_path, encoding='utf-8') as fp:
+            for line in fp:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # torn last line of an interrupted run
+                if record.get("status") == "ok":
+                    done.add(record["input"])
+    return done
+
+def _run_job(job: tuple) -> dict:
+    """Worker entry point: run one CLI command on one file and time it"""
+    command, path, output, options = job
+    record = {"input": path, "command": command}
+    hits = _decode_cache.hits if _decode_cache is not None else None
+    start = time.perf_counter()
+    try:
+        if command == "hide":
+            # hide() writes through temp files, so only complete outputs carry the final name
+            result = hide(path, output, options["payload"], highlight=options["highlight"],
+                          compress=options["compress"], depth=options["depth"], channels=options["channels"],
+                          key=options["key"], compress_level=options["compress_level"],
+                          optimize=options["optimize"])
+            if not result.ok:
+                raise ValueError(result.error)
+            record["timings"] = result.timings
+            record["bits_embedded"] = result.bits_embedded
+            if result.highlight_path:
+                record["highlight"] = result.highlight_path
+            record["output"] = output
+        elif command == "extract":
+            result = extract(path, key=options["key"])
+            if not result.ok:
+                raise ValueError(result.error)
+            record["timings"] = result.timings
+            payload = result.payload
+            record["found"] = payload is not None
+            if payload is not None:
+                record["bytes"] = len(payload)
+                if output:
+                    with open(output, "wb") as fp:
+                        fp.write(payload)
+                    record["output"] = output
+                else:
+                    record["message"] = payload.decode('utf-8', errors='replace')
+        else:
+            record["header"] = probe(path)
+            record["capacity"] = capacity(path)
+        record["status"] = "ok"
+    except Exception as e:
+        record["status"] = "error"
+        record["error"] = str(e)
+    record["seconds"] = round(time.perf_counter() - start, 6)
+    if hits is not None:
+        record["cache_hits"] = _decode_cache.hits - hits
+    return record
+
+def _run_sharded(args, paths: list, options: dict) -> int:
+    """shard: one JSON line per carrier; unshard: one JSON line for the reassembled payload"""
+    records = []
+    if args.command == "shard":
+        try:
+            results = hide_sharded(paths, options["out_dir"], options["payload"], args.workers,
+                                   options["compress"], options["depth"], options["channels"], options["key"],
+                                   options["compress_level"], options["optimize"])
+        except ValueError as e:
+            results = []
+            records.append({"command": "shard", "status": "error", "error": str(e)})
+        for path, result in zip(paths, results):
+            record = {"input": path, "command": "shard", "status": "ok" if result.ok else "error"}
+            if result.ok:
+                record.update(output=result.output_path, bits_embedded=result.bits_embedded,
+                              timings=result.timings)
+            else:
+                record["error"] = result.error
+            records.append(record)
+    else:
+        report = extract_sharded(paths, options["key"], args.workers)
+        record = {"command": "unshard", "status": "ok" if report.ok else "error", "inputs": len(paths),
+                  "shards": report.count}
+        if report.ok:
+            with open(args.out, "wb") as fp:
+                fp.write(report.payload)
+            record.update(bytes=len(report.payload), output=args.out)
+        else:
+            record.update(error=report.error, missing=report.missing)
+        if report.errors:
+            record["errors"] = report.errors
+        records.append(record)
+
+    with open(args.log, "a", encoding='utf-8') if args.log else nullcontext() as log:
+        for record in records:
+            line = json.dumps(record)
+            print(line, flush=True)
+            if log:
+                log.write(line + "\n")
+    return 0 if all(r["status"] == "ok" for r in records) else 1
+
+def _run_scan(args, paths: list) -> int:
+    """scan: one JSON line per image, most suspicious first"""
+    reports = scan(paths, args.workers)
+    if args.top:
+        reports = reports[:args.top]
+    with open(args.log, "a", encoding='utf-8') if args.log else nullcontext() as log:
+        for report in reports:
+            line = json.dumps({"command": "scan", **report})
+            print(line, flush=True)
+            if log:
+                log.write(line + "\n")
+    return 0 if all(r["status"] == "ok" for r in reports) else 1
+
+def main(argv=None) -> int:
+    """Batch hide/extract/probe/scan over many carriers, one JSON line per file, or shard one payload across them"""
+    parser = argparse.ArgumentParser(prog="python -m stego",
+                                     description="Batch LSB steganography over many images.")
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("inputs", nargs="*", help="image files, directories or glob patterns")
+    common.add_argument("--manifest", help="file listing one input per line")
+    common.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="worker processes (default: CPU count)")
+    common.add_argument("--log", help="append JSON lines here as well as to stdout")
+    common.add_argument("--resume", action="store_true",
+                        help="skip inputs already recorded as ok in --log")
+    common.add_argument("--cache-mb", type=int, default=0,
+                        help="per-worker cache of decoded carriers, in MB (default: off)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    embedding = argparse.ArgumentParser(add_help=False)
+    source = embedding.add_mutually_exclusive_group(required=True)
+    source.add_argument("--message", help="text payload")
+    source.add_argument("--payload-file", help="binary payload file")
+    embedding.add_argument("--out-dir", required=True, help="directory for stego images")
+    embedding.add_argument("--compress", choices=("auto",) + tuple(CODECS),
+                           help="compress the payload first; auto picks the codec from a sample")
+    embedding.add_argument("--depth", type=int, choices=DEPTHS, default=1, help="bits per channel (default: 1)")
+    embedding.add_argument("--channels", default="RGB",
+                           help="channels to write, e.g. RGB or RGBA (default: RGB)")
+    embedding.add_argument("--key", help="scatter payload pixels in an order picked by this key")
+    embedding.add_argument("--compress-level", type=int, choices=range(10), default=PNG_COMPRESS_LEVEL,
+                           metavar="0-9", help="PNG zlib level; 1 is fastest (default: 6)")
+    embedding.add_argument("--optimize", action="store_true", help="smallest PNG output, slowest encode")
+
+    hide = commands.add_parser("hide", parents=[common, embedding], help="embed a payload into each image")
+    hide.add_argument("--highlight", choices=HIGHLIGHT_STYLES,
+                      help="also write a highlight map in this style (default: none)")
+
+    extract = commands.add_parser("extract", parents=[common], help="extract payloads")
+    extract.add_argument("--out-dir", help="write payloads here as <name>.bin instead of inline")
+    extract.add_argument("--key", help="key used to hide scattered payloads")
+
+    commands.add_parser("probe", parents=[common], help="read container headers only")
+
+    commands.add_parser("shard", parents=[common, embedding],
+                        help="split one payload across all the images, sized to their capacity")
+    unshard = commands.add_parser("unshard", parents=[common], help="reassemble a sharded payload")
+    unshard.add_argument("--out", required=True, help="file to write the reassembled payload to")
+    unshard.add_argument("--key", help="key used to hide scattered shards")
+
+    scan_ = commands.add_parser("scan", parents=[common],
+                                help="rank images by signs of an LSB payload, without extracting")
+    scan_.add_argument("--top", type=int, help="only report this many of the most suspicious images")
+
+    args = parser.parse_args(argv)
+    if args.resume and not args.log:
+        parser.error("--resume needs --log")
+    paths = _collect_inputs(args.inputs, args.manifest)
+    if not paths:
+        parser.error("no input images given")
+
+    options = {"out_dir": getattr(args, "out_dir", None), "highlight": getattr(args, "highlight", None),
+               "compress": getattr(args, "compress", None), "depth": getattr(args, "depth", 1),
+               "channels": getattr(args, "channels", "RGB"), "key": getattr(args, "key", None),
+               "compress_level": getattr(args, "compress_level", PNG_COMPRESS_LEVEL),
+               "optimize": getattr(args, "optimize", False)}
+    if args.command in ("hide", "shard"):
+        try:
+            _parse_layout(args.depth, args.channels)
+        except ValueError as e:
+            parser.error(str(e))
+        if args.payload_file:
+            with open(args.payload_file, "rb") as fp:
+                options["payload"] = fp.read()
+        else:
+            options["payload"] = args.message.encode('utf-8')
+    if args.command == "hide":
+        # Pick the codec once for the whole batch instead of retrying every codec per file
+        stored, codec = _compress_payload(memoryview(options["payload"]), options["compress"])
+        options["compress"] = codec
+        stored_size = len(stored)
+    if options["out_dir"]:
+        os.makedirs(options["out_dir"], exist_ok=True)
+    if args.command in ("shard", "unshard"):
+        return _run_sharded(args, paths, options)
+
+    # Outputs mirror the input tree, so same-named files in different directories stay apart
+    outputs, collisions = {}, {}
+    if options["out_dir"] and args.command in ("hide", "extract"):
+        outputs, collisions = _output_paths(paths, options["out_dir"], ".png" if args.command == "hide" else ".bin")
+        for output in outputs.values():
+            os.makedirs(os.path.dirname(output), exist_ok=True)
+
+    if args.resume:
+        done = _load_journal(args.log)
+        paths = [p for p in paths if p not in done]
+    if args.command == "scan":
+        return _run_scan(args, paths)
+
+    # Carriers too small for the payload are rejected from their headers, never scheduled
+    skipped = {path: {"input": path, "command": args.command, "status": "error",
+                      "error": f"Output name collides with that of {collisions[path]}", "seconds": 0.0}
+               for path in paths if path in collisions}
+    if args.command == "hide":
+        for path in paths:
+            if path in skipped:
+                continue
+            try:
+                available = capacity(path, depth=options["depth"], channels=options["channels"])
+            except Exception:
+                continue  # unreadable: let the worker report the error
+            if available < stored_size:
+                skipped[path] = {"input": path, "command": "hide", "status": "skipped",
+                                 "error": "Image too small to hide this message",
+                                 "capacity": available, "seconds": 0.0}
+
+    workers = max(1, args.workers)
+    log = open(args.log, "a", encoding='utf-8') if args.log else None
+    failures = 0
+    try:
+        jobs = [(args.command, path, outputs.get(path), options) for path in paths if path not in skipped]
+        initializer = enable_decode_cache if args.cache_mb > 0 else None
+        with ProcessPoolExecutor(max_workers=workers, initializer=initializer,
+                                 initargs=(args.cache_mb << 20,) if initializer else ()) as pool:
+            # map() yields in submission order, so output order never depends on timing
+            results = pool.map(_run_job, jobs, chunksize=max(1, len(jobs) // (8 * workers)))
+            for path in paths:
+                record = skipped[path] if path in skipped else next(results)
+                line = json.dumps(record)
+                print(line, flush=True)
+                if log:
+                    log.write(line + "\n")
+                    log.flush()
+                failures += record["status"] != "ok"
+    finally:
+        if log:
+            log.close()
+    return 1 if failures else 0
 
-    return "No hidden message found!"
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,18 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+from PIL import Image
+
+# The modules live at the repository root, next to this directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+@pytest.fixture
+def carrier(tmp_path):
+    """Small noisy RGB PNG carrier with an ICC profile and a transparent colour"""
+    rng = np.random.default_rng(7)
+    path = tmp_path / "carrier.png"
+    img = Image.fromarray(rng.integers(0, 256, (40, 48, 3), dtype=np.uint8), "RGB")
+    img.save(path, icc_profile=b"test icc profile", transparency=(1, 2, 3))
+    return str(path)
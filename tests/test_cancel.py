@@ -0,0 +1,43 @@
+import os
+
+import numpy as np
+import pytest
+from PIL import Image
+
+import stego
+
+def _cancel_at(stage):
+    def progress(fraction, current):
+        if current == stage:
+            raise stego.OperationCancelled()
+    return progress
+
+@pytest.mark.parametrize("stage", ["decode", "embed", "save", "write"])
+def test_cancel_before_the_rename_leaves_no_output(carrier, tmp_path, stage):
+    output = tmp_path / "out.png"
+    with pytest.raises(stego.OperationCancelled):
+        stego.hide(carrier, str(output), b"cancelled", highlight="full", progress=_cancel_at(stage))
+    assert sorted(os.listdir(tmp_path)) == ["carrier.png"]
+
+def test_cancel_after_the_outputs_exist_is_ignored(carrier, tmp_path):
+    output = str(tmp_path / "out.png")
+    result = stego.hide(carrier, output, b"finished", progress=_cancel_at("done"))
+    assert result.ok
+    assert stego.extract_bytes(output) == b"finished"
+
+def test_cancelled_in_place_hide_leaves_the_carrier_untouched(tmp_path):
+    path = tmp_path / "carrier.bmp"
+    Image.fromarray(np.random.default_rng(8).integers(0, 256, (30, 40, 3), dtype=np.uint8)).save(path)
+    before = path.read_bytes()
+    with pytest.raises(stego.OperationCancelled):
+        stego.hide_in_place(str(path), b"cancelled", progress=_cancel_at("save"))
+    assert path.read_bytes() == before
+
+def test_cancelled_frames_hide_leaves_no_output(tmp_path):
+    rng = np.random.default_rng(9)
+    frames = [Image.fromarray(rng.integers(0, 256, (20, 30, 3), dtype=np.uint8)) for _ in range(3)]
+    frames[0].save(tmp_path / "anim.gif", save_all=True, append_images=frames[1:], duration=50)
+    with pytest.raises(stego.OperationCancelled):
+        stego.hide(str(tmp_path / "anim.gif"), str(tmp_path / "out.png"), b"x" * 200,
+                   progress=_cancel_at("write"))
+    assert sorted(os.listdir(tmp_path)) == ["anim.gif"]
@@ -0,0 +1,51 @@
+import json
+import os
+
+import numpy as np
+import pytest
+from PIL import Image
+
+import stego
+
+def _carriers(root, names):
+    rng = np.random.default_rng(6)
+    for name in names:
+        path = root / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        Image.fromarray(rng.integers(0, 256, (40, 50, 3), dtype=np.uint8)).save(path)
+
+def _records(capsys):
+    return {r["input"]: r for r in map(json.loads, capsys.readouterr().out.splitlines())}
+
+def test_outputs_mirror_input_directories(tmp_path, capsys):
+    _carriers(tmp_path, ["in/a/x.png", "in/b/x.png"])
+    out = tmp_path / "out"
+    assert stego.main(["hide", str(tmp_path / "in"), "--message", "hi", "--out-dir", str(out), "--workers", "1"]) == 0
+    records = _records(capsys)
+    assert {os.path.relpath(r["output"], out) for r in records.values()} == \
+        {os.path.join("a", "x.png"), os.path.join("b", "x.png")}
+
+    payloads = tmp_path / "payloads"
+    assert stego.main(["extract", str(out), "--out-dir", str(payloads), "--workers", "1"]) == 0
+    for record in _records(capsys).values():
+        with open(record["output"], "rb") as fp:
+            assert fp.read() == b"hi"
+    assert len(os.listdir(payloads / "a")) == len(os.listdir(payloads / "b")) == 1
+
+def test_colliding_output_names_fail_instead_of_overwriting(tmp_path, capsys):
+    _carriers(tmp_path, ["in/x.png", "in/x.bmp"])
+    out = tmp_path / "out"
+    assert stego.main(["hide", str(tmp_path / "in"), "--message", "hi", "--out-dir", str(out), "--workers", "1"]) == 1
+    records = _records(capsys)
+    assert records[str(tmp_path / "in" / "x.bmp")]["status"] == "ok"
+    assert records[str(tmp_path / "in" / "x.png")]["status"] == "error"
+    assert os.listdir(out) == ["x.png"]
+
+def test_resume_without_a_log_is_an_error(tmp_path, capsys):
+    _carriers(tmp_path, ["in/x.png"])
+    with pytest.raises(SystemExit) as exit_info:
+        stego.main(["hide", str(tmp_path / "in"), "--message", "hi", "--out-dir", str(tmp_path / "out"),
+                    "--resume"])
+    assert exit_info.value.code == 2
+    assert "--resume needs --log" in capsys.readouterr().err
+    assert not (tmp_path / "out").exists()
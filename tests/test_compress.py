@@ -0,0 +1,30 @@
+import os
+
+import pytest
+
+import stego
+
+TEXT = b"".join(b"2026-10-18 INFO worker-%d request id=%d served\n" % (i % 8, i * 7919) for i in range(20_000))
+
+@pytest.mark.parametrize("compress", ["auto"] + list(stego.CODECS))
+def test_compressed_payload_round_trips(carrier, tmp_path, compress):
+    payload = TEXT[:4000]
+    output = str(tmp_path / "out.png")
+    result = stego.hide(carrier, output, payload, compress=compress)
+    assert result.ok, result.summary
+    assert stego.extract_bytes(output) == payload
+
+def test_auto_compresses_with_one_codec_picked_from_a_sample(monkeypatch):
+    calls = []
+    compress = stego._compress
+    monkeypatch.setattr(stego, "_compress", lambda data, codec: calls.append((len(data), codec)) or compress(data, codec))
+    stored, codec = stego._compress_payload(memoryview(TEXT), "auto")
+    assert codec in stego.CODECS
+    assert stego._decompress(bytes(stored), codec) == TEXT
+    # Every codec sees the sample; only the winner sees the whole payload
+    assert [c for n, c in calls if n == len(TEXT)] == [codec]
+    assert all(n <= stego.COMPRESS_SAMPLE for n, c in calls if n != len(TEXT))
+
+def test_auto_stores_incompressible_payloads_raw():
+    payload = memoryview(os.urandom(200_000))
+    assert stego._compress_payload(payload, "auto") == (payload, None)
@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+from PIL import Image
+
+import stego
+
+@pytest.fixture
+def cache():
+    yield stego.enable_decode_cache(1 << 26)
+    stego.disable_decode_cache()
+
+def test_hide_then_extract_is_served_from_the_cache(carrier, tmp_path, cache):
+    output = str(tmp_path / "out.png")
+    assert stego.hide(carrier, output, b"cached").ok
+    hits = cache.hits
+    assert stego.extract_bytes(output) == b"cached"
+    assert cache.hits > hits
+
+def test_multi_frame_carriers_are_not_cached(tmp_path, cache):
+    rng = np.random.default_rng(11)
+    frames = [Image.fromarray(rng.integers(0, 256, (20, 30, 3), dtype=np.uint8)) for _ in range(4)]
+    path = str(tmp_path / "anim.gif")
+    frames[0].save(path, save_all=True, append_images=frames[1:], duration=50)
+    before = stego.capacity(path)
+    assert stego.hide_image(path, "legacy", legacy=True).ok  # embeds the first frame only
+    assert cache.get(path) is None
+    assert stego.capacity(path) == before
+
+def test_warm_cache_writes_the_same_output_as_a_cold_one(carrier, tmp_path, cache):
+    cold, warm = str(tmp_path / "cold.png"), str(tmp_path / "warm.png")
+    assert stego.hide(carrier, cold, b"same").ok
+    hits = cache.hits
+    assert stego.hide(carrier, warm, b"same").ok
+    assert cache.hits > hits
+    cold_img, warm_img = Image.open(cold), Image.open(warm)
+    assert warm_img.info == cold_img.info
+    assert warm_img.info["icc_profile"] == b"test icc profile"
+    assert np.array_equal(np.array(warm_img), np.array(cold_img))
+
+def test_cached_carriers_keep_their_format_and_mode(tmp_path, cache):
+    rng = np.random.default_rng(13)
+    pixels = rng.integers(0, 256, (40, 48, 3), dtype=np.uint8)
+    jpeg, palette = str(tmp_path / "photo.jpg"), str(tmp_path / "palette.png")
+    Image.fromarray(pixels).save(jpeg)
+    Image.fromarray(pixels).quantize(64).save(palette)
+    for path in (jpeg, palette):
+        assert stego.hide(path, str(tmp_path / "out.png"), b"x").ok
+        assert cache.get(path) is not None
+    assert stego.scan_image(jpeg)["verdict"] == "lossy"
+    assert stego.scan_image(palette)["spa"] == 0.0  # palette carriers skip the statistics
+    assert stego.capacity(palette) == stego.capacity_for(48, 40, "P")
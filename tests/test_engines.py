@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+from PIL import Image
+
+import stego
+
+CASES = [
+    {},
+    {"legacy": True},
+    {"depth": 2},
+    {"depth": 3, "channels": "B"},
+    {"channels": "RG", "compress": "zlib"},
+    {"key": "secret"},
+    {"highlight": "full"},
+    {"highlight": "mask"},
+    {"highlight": "heatmap"},
+]
+
+def _hide(carrier, tmp_path, engine, options):
+    output = str(tmp_path / f"{engine}.png")
+    payload = "engines agree" if options.get("legacy") else b"engines agree"
+    result = stego.hide(carrier, output, payload, engine=engine, **options)
+    assert result.ok, result.summary
+    return result
+
+@pytest.mark.parametrize("options", CASES, ids=lambda o: ",".join(f"{k}={v}" for k, v in o.items()) or "default")
+def test_numpy_and_loop_engines_write_identical_files(carrier, tmp_path, options):
+    fast = _hide(carrier, tmp_path, "numpy", options)
+    slow = _hide(carrier, tmp_path, "loop", options)
+    assert fast.bits_embedded == slow.bits_embedded
+
+    with Image.open(fast.output_path) as a, Image.open(slow.output_path) as b:
+        assert a.mode == b.mode
+        assert np.array_equal(np.asarray(a), np.asarray(b))
+        assert a.info.get("icc_profile") == b.info.get("icc_profile") == b"test icc profile"
+        assert a.info.get("transparency") == b.info.get("transparency") == (1, 2, 3)
+
+    if options.get("highlight"):
+        with Image.open(fast.highlight_path) as a, Image.open(slow.highlight_path) as b:
+            assert np.array_equal(np.asarray(a), np.asarray(b))
+
+    key = options.get("key")
+    for engine in stego.ENGINES:
+        extracted = stego.extract(fast.output_path, engine=engine, key=key)
+        assert extracted.ok
+        assert extracted.payload == b"engines agree"
+
+def test_hide_image_keeps_carrier_info(carrier):
+    with Image.open(carrier) as img:
+        result = stego.hide_image(img, b"in memory")
+    assert result.ok
+    assert result.image.info["icc_profile"] == b"test icc profile"
@@ -0,0 +1,84 @@
+import os
+
+import numpy as np
+import pytest
+from PIL import Image
+
+import stego
+
+def _pages(count, size=(40, 30), seed=13):
+    rng = np.random.default_rng(seed)
+    return [Image.fromarray(rng.integers(0, 256, size[::-1] + (3,), dtype=np.uint8)) for _ in range(count)]
+
+@pytest.fixture
+def tiff(tmp_path):
+    path = str(tmp_path / "pages.tif")
+    pages = _pages(4)
+    pages[0].save(path, save_all=True, append_images=pages[1:])  # uncompressed, so memory-mappable
+    return path
+
+def test_capacity_counts_every_page_of_a_mapped_tiff(tiff):
+    assert stego._raw_layout(tiff) is not None
+    single = stego.capacity_for(40, 30)
+    assert stego.capacity(tiff) > 3 * single
+
+@pytest.mark.parametrize("name", ["out.tif", "out.png"])
+def test_payload_spans_pages_whatever_the_output_type(tiff, tmp_path, name):
+    payload = bytes(range(256)) * 6  # more than one page holds
+    output = str(tmp_path / name)
+    result = stego.hide(tiff, output, payload)
+    assert result.ok, result.summary
+    assert stego.extract_bytes(output) == payload
+    with Image.open(output) as img:
+        assert img.n_frames == 4
+
+def test_animated_gif_round_trip(tmp_path):
+    frames = _pages(3, (30, 20))
+    path = str(tmp_path / "anim.gif")
+    frames[0].save(path, save_all=True, append_images=frames[1:], duration=[40, 80, 120], loop=0)
+    payload = b"frames" * 100
+    assert len(payload) > stego.capacity_for(30, 20)
+    output = str(tmp_path / "anim_out.png")
+    assert stego.hide(path, output, payload).ok
+    assert stego.extract_bytes(output) == payload
+    with Image.open(output) as img:
+        durations = []
+        for index in range(img.n_frames):
+            img.seek(index)
+            durations.append(img.info["duration"])
+    assert durations == [40, 80, 120]
+
+@pytest.fixture
+def gif(tmp_path):
+    frames = _pages(3, (30, 20))
+    path = str(tmp_path / "anim.gif")
+    frames[0].save(path, save_all=True, append_images=frames[1:], duration=50)
+    return path
+
+@pytest.mark.parametrize("options, error", [
+    ({"engine": "bogus"}, "Unknown engine 'bogus'"),
+    ({"highlight": "bogus"}, "Unknown highlight style 'bogus'"),
+    ({"highlight": "mask"}, "Highlights are not supported for multi-frame carriers"),
+    ({"legacy": True}, "The legacy format cannot span frames; drop legacy to keep every frame"),
+])
+def test_options_multi_frame_carriers_cannot_honour_fail(gif, tmp_path, options, error):
+    output = str(tmp_path / "out.png")
+    result = stego.hide(gif, output, b"hi", **options)
+    assert not result.ok
+    assert result.error == error
+    assert not (tmp_path / "out.png").exists()
+
+@pytest.mark.parametrize("name", ["out.png", "out.tif"])
+def test_optimize_reaches_the_frame_writers(tmp_path, name):
+    ramp = np.tile(np.arange(64, dtype=np.uint8)[None, :, None], (48, 1, 3))
+    pages = [Image.fromarray(ramp + 8 * i) for i in range(3)]
+    tiff = str(tmp_path / "smooth.tif")
+    pages[0].save(tiff, save_all=True, append_images=pages[1:])
+    plain, optimized = str(tmp_path / f"plain_{name}"), str(tmp_path / f"opt_{name}")
+    assert stego.hide(tiff, plain, b"optimize", compress_level=1).ok
+    assert stego.hide(tiff, optimized, b"optimize", compress_level=1, optimize=True).ok
+    assert stego.extract_bytes(optimized) == b"optimize"
+    assert os.path.getsize(optimized) < os.path.getsize(plain)
+    if name.endswith(".tif"):
+        with Image.open(optimized) as img:
+            assert img.info["compression"] == "tiff_adobe_deflate"
@@ -0,0 +1,22 @@
+import io
+
+import numpy as np
+import pytest
+
+import stego
+
+@pytest.mark.parametrize("carrier", [np.zeros((20, 20, 3), np.float32), b"not an image", io.BytesIO(b"")],
+                         ids=["float-array", "bytes", "empty-file"])
+def test_unusable_carriers_fail_like_extraction(carrier):
+    hidden = stego.hide_image(carrier, b"payload")
+    assert not hidden.ok
+    assert hidden.summary.startswith("Error: Cannot open image!")
+    if isinstance(carrier, io.BytesIO):
+        carrier.seek(0)
+    assert stego.extract_image(carrier).summary.startswith("Error: Cannot open image!")
+
+def test_array_round_trip():
+    carrier = np.random.default_rng(10).integers(0, 256, (30, 30, 3), dtype=np.uint8)
+    result = stego.hide_image(carrier, b"in memory")
+    assert result.ok
+    assert stego.extract_image(result.array).payload == b"in memory"
@@ -0,0 +1,90 @@
+import struct
+
+import numpy as np
+import pytest
+from PIL import Image
+
+import stego
+
+def _pixels(width, height=41, seed=21):
+    return np.random.default_rng(seed).integers(0, 256, (height, width, 3), dtype=np.uint8)
+
+def _write_bmp(path, arr, bpp=24, top_down=False):
+    """Uncompressed BMP written by hand, so both row orders and 32-bit pixels are covered"""
+    height, width = arr.shape[:2]
+    stride = (width * bpp + 31) // 32 * 4
+    pixel = arr[..., ::-1]  # BGR
+    if bpp == 32:
+        pixel = np.concatenate([pixel, np.full((height, width, 1), 0x5A, np.uint8)], axis=2)
+    rows = np.zeros((height, stride), np.uint8)
+    rows[:, :width * bpp // 8] = pixel.reshape(height, -1)
+    rows[:, width * bpp // 8:] = 0xEE  # padding must never be touched
+    if not top_down:
+        rows = rows[::-1]
+    header = struct.pack("<2sIHHI", b"BM", 54 + rows.size, 0, 0, 54)
+    dib = struct.pack("<IiiHHIIiiII", 40, width, -height if top_down else height, 1, bpp, 0, rows.size,
+                      2835, 2835, 0, 0)
+    with open(path, "wb") as fp:
+        fp.write(header + dib + rows.tobytes())
+
+def _check_round_trip(source, output, decoded):
+    """Embed in place, then compare the memory-mapped extraction with a full decode of the output"""
+    payload = bytes(range(256)) + b"in place"
+    result = stego.hide_in_place(str(source), payload, str(output))
+    assert result.ok, result.summary
+    layout = stego._raw_layout(str(output))
+    assert layout is not None
+    with open(source, "rb") as a, open(output, "rb") as b:
+        before, after = a.read(), b.read()
+    assert len(after) == len(before)
+    first = int(layout[3].min())
+    assert after[:first] == before[:first]  # headers are left alone
+    assert stego.extract_bytes(str(output)) == payload
+    assert stego.extract_image(decoded(str(output))).payload == payload
+    return before, after
+
+@pytest.mark.parametrize("top_down", [False, True], ids=["bottom-up", "top-down"])
+@pytest.mark.parametrize("width", [31, 32, 33])
+def test_24_bit_bmp_rows_and_padding(tmp_path, width, top_down):
+    source, output = tmp_path / "in.bmp", tmp_path / "out.bmp"
+    _write_bmp(source, _pixels(width), top_down=top_down)
+    _, after = _check_round_trip(source, output, lambda p: np.array(Image.open(p)))
+    stride = (width * 3 + 3) // 4 * 4
+    rows = np.frombuffer(after[54:], np.uint8).reshape(-1, stride)
+    assert (rows[:, width * 3:] == 0xEE).all()
+
+@pytest.mark.parametrize("top_down", [False, True], ids=["bottom-up", "top-down"])
+def test_32_bit_bmp_leaves_the_fourth_byte(tmp_path, top_down):
+    source, output = tmp_path / "in.bmp", tmp_path / "out.bmp"
+    _write_bmp(source, _pixels(33), bpp=32, top_down=top_down)
+    _, after = _check_round_trip(source, output, lambda p: np.array(Image.open(p).convert("RGB")))
+    assert (np.frombuffer(after[54:], np.uint8)[3::4] == 0x5A).all()
+
+def test_binary_ppm(tmp_path):
+    source, output = tmp_path / "in.ppm", tmp_path / "out.ppm"
+    Image.fromarray(_pixels(33)).save(source)
+    assert open(source, "rb").read(2) == b"P6"
+    _check_round_trip(source, output, lambda p: np.array(Image.open(p)))
+
+@pytest.mark.parametrize("channels", [3, 4])
+def test_uint8_npy(tmp_path, channels):
+    source, output = tmp_path / "in.npy", tmp_path / "out.npy"
+    arr = np.random.default_rng(3).integers(0, 256, (41, 33, channels), dtype=np.uint8)
+    np.save(source, arr)
+    _check_round_trip(source, output, np.load)
+    if channels == 4:
+        assert np.array_equal(np.load(output)[..., 3], arr[..., 3])  # RGB payloads leave alpha alone
+
+def test_uncompressed_single_page_tiff(tmp_path):
+    source, output = tmp_path / "in.tif", tmp_path / "out.tif"
+    Image.fromarray(_pixels(33)).save(source)
+    assert stego._raw_layout(str(source))[0] == "TIFF"
+    _check_round_trip(source, output, lambda p: np.array(Image.open(p)))
+
+def test_hide_routes_same_extension_outputs_in_place(tmp_path):
+    source, output = tmp_path / "in.bmp", tmp_path / "out.bmp"
+    _write_bmp(source, _pixels(31))
+    result = stego.hide(str(source), str(output), b"routed")
+    assert result.ok and result.output_path == str(output)
+    assert "copy" in result.timings and "encode" not in result.timings
+    assert stego.extract_image(np.array(Image.open(output))).payload == b"routed"
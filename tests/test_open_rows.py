@@ -0,0 +1,54 @@
+import io
+
+import numpy as np
+import pytest
+from PIL import Image
+
+import stego
+
+@pytest.fixture(params=["RGB", "RGBA"])
+def png(request, tmp_path):
+    rng = np.random.default_rng(3)
+    channels = len(request.param)
+    pixels = rng.integers(0, 256, (97, 300, channels), dtype=np.uint8)
+    path = tmp_path / "rows.png"
+    Image.fromarray(pixels, request.param).save(path)
+    return str(path), pixels
+
+def test_truncated_decode_is_supported_by_installed_pillow():
+    assert stego._partial_png_supported()
+
+@pytest.mark.parametrize("rows", [1, 10, 96])
+def test_truncated_decode_returns_the_first_rows(png, rows):
+    path, pixels = png
+    for source in (path, io.BytesIO(open(path, "rb").read())):
+        img = stego._open_rows(source, rows)
+        assert img.size == (300, rows)
+        assert np.array_equal(np.asarray(img), pixels[:rows])
+
+@pytest.mark.parametrize("rows", [97, 500])
+def test_rows_past_the_end_decode_everything(png, rows):
+    path, pixels = png
+    assert np.array_equal(np.asarray(stego._open_rows(path, rows)), pixels)
+
+def test_full_decode_fallback(png, monkeypatch):
+    path, pixels = png
+    monkeypatch.setattr(stego, "_partial_png", False)
+    img = stego._open_rows(path, 10)
+    assert np.array_equal(np.asarray(img)[:10], pixels[:10])
+
+def test_failed_truncated_decode_falls_back(png, monkeypatch):
+    path, pixels = png
+    monkeypatch.setattr(stego, "_truncate_png", lambda img, rows: setattr(img, "tile", [("bogus",) * 4]) or True)
+    img = stego._open_rows(path, 10)
+    assert np.array_equal(np.asarray(img)[:10], pixels[:10])
+
+def test_extraction_stops_early_with_correct_payload(tmp_path):
+    rng = np.random.default_rng(4)
+    carrier = tmp_path / "big.png"
+    Image.fromarray(rng.integers(0, 256, (400, 500, 3), dtype=np.uint8)).save(carrier)
+    output = str(tmp_path / "out.png")
+    assert stego.hide(str(carrier), output, b"early").ok
+    assert stego.extract_bytes(output) == b"early"
+    assert stego.extract_message(stego.hide(str(carrier), output, "legacy", legacy=True).output_path) \
+        == "Hidden message: legacy"
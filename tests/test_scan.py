@@ -0,0 +1,87 @@
+import io
+import os
+
+import numpy as np
+import pytest
+from PIL import Image
+
+import benchmark
+import stego
+
+TEST_PNG = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "test.png")
+
+def photo():
+    return np.array(Image.open(TEST_PNG).convert("RGB"))
+
+def gradient(sigma=2.0):
+    rng = np.random.default_rng(3)
+    y, x = np.mgrid[0:300, 0:400]
+    base = np.stack([x / 400 * 255, y / 300 * 255, (x + y) / 700 * 255], axis=-1)
+    return np.clip(base + rng.normal(0, sigma, base.shape), 0, 255).astype(np.uint8)
+
+def randomize_lsbs(arr, rate=1.0, rows=None):
+    """Overwrite the LSBs of a random `rate` of the values, in the first `rows` rows only if given"""
+    rng = np.random.default_rng(5)
+    out = arr.copy()
+    part = out[:rows]
+    mask = rng.random(part.shape) < rate
+    part[mask] = (part[mask] & 0xFE) | rng.integers(0, 2, int(mask.sum()), dtype=np.uint8)
+    return out
+
+def save(tmp_path, name, arr):
+    path = str(tmp_path / name)
+    Image.fromarray(arr).save(path)
+    return path
+
+def jpeg_roundtrip(arr):
+    buf = io.BytesIO()
+    Image.fromarray(arr).save(buf, "JPEG", quality=85)
+    return np.array(Image.open(buf))
+
+@pytest.mark.parametrize("make", [photo, gradient, lambda: jpeg_roundtrip(gradient(5.0))],
+                         ids=["photo", "gradient", "decoded-jpeg"])
+def test_clean_images_scan_clean(tmp_path, make):
+    report = stego.scan_image(save(tmp_path, "clean.png", make()))
+    assert report["verdict"] == "clean", report
+    assert report["score"] < stego.SCAN_THRESHOLD
+
+def test_benchmark_carriers_scan_clean(tmp_path):
+    for mode in ("RGB", "L", "P"):
+        report = stego.scan_image(benchmark.make_carrier(1, mode, str(tmp_path)))
+        assert report["verdict"] == "clean", (mode, report)
+
+@pytest.mark.parametrize("rate", [0.3, 1.0])
+@pytest.mark.parametrize("make", [photo, gradient], ids=["photo", "gradient"])
+def test_scattered_embedding_is_suspicious(tmp_path, make, rate):
+    report = stego.scan_image(save(tmp_path, "stego.png", randomize_lsbs(make(), rate)))
+    assert report["verdict"] == "suspicious", report
+    assert abs(report["spa"] - rate) < 0.05
+
+@pytest.mark.parametrize("make", [photo, gradient], ids=["photo", "gradient"])
+def test_sequential_embedding_is_suspicious(tmp_path, make):
+    arr = make()
+    report = stego.scan_image(save(tmp_path, "stego.png", randomize_lsbs(arr, rows=arr.shape[0] // 8)))
+    assert report["verdict"] == "suspicious", report
+    assert report["chi_square"] > 0.95
+
+@pytest.mark.parametrize("legacy", [False, True])
+def test_own_payloads_are_found_by_signature(tmp_path, legacy):
+    output = str(tmp_path / "out.png")
+    assert stego.hide(TEST_PNG, output, "a hidden message", legacy=legacy).ok
+    report = stego.scan_image(output)
+    assert report["verdict"] == "payload"
+    assert report["signature"] == ("legacy" if legacy else "container")
+
+def test_jpeg_is_reported_lossy(tmp_path):
+    path = str(tmp_path / "photo.jpg")
+    Image.fromarray(photo()).save(path, quality=90)
+    assert stego.scan_image(path)["verdict"] == "lossy"
+
+def test_scan_ranks_payload_then_suspicious_then_clean(tmp_path):
+    clean = save(tmp_path, "a_clean.png", photo())
+    suspicious = save(tmp_path, "b_suspicious.png", randomize_lsbs(photo(), 0.5))
+    payload = str(tmp_path / "c_payload.png")
+    assert stego.hide(clean, payload, "ranked").ok
+    reports = stego.scan([clean, suspicious, payload, str(tmp_path / "missing.png")], workers=1)
+    assert [r["input"] for r in reports[:3]] == [payload, suspicious, clean]
+    assert reports[3]["status"] == "error"
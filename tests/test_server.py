@@ -0,0 +1,104 @@
+import http.client
+import io
+import json
+import os
+import re
+import socket
+import time
+from urllib.parse import urlsplit
+
+import numpy as np
+import pytest
+from PIL import Image
+
+import server
+
+def _png(width=120, height=90, seed=12) -> bytes:
+    buffer = io.BytesIO()
+    Image.fromarray(np.random.default_rng(seed).integers(0, 256, (height, width, 3), dtype=np.uint8)).save(buffer, "PNG")
+    return buffer.getvalue()
+
+def _request(url, method, path, body=None, headers=None):
+    connection = http.client.HTTPConnection(urlsplit(url).netloc, timeout=30)
+    try:
+        connection.request(method, path, body, headers or {})
+        response = connection.getresponse()
+        return response.status, dict(response.getheaders()), response.read()
+    finally:
+        connection.close()
+
+@pytest.fixture(scope="module")
+def url():
+    with server.BackgroundServer(workers=1) as url:
+        yield url
+
+def test_hide_extract_round_trip(url):
+    status, headers, stego_png = _request(url, "POST", "/hide?message=hello%20server", _png())
+    assert status == 200
+    assert headers["Content-Type"] == "image/png"
+    status, headers, payload = _request(url, "POST", "/extract", stego_png)
+    assert status == 200
+    assert payload == b"hello server"
+    assert json.loads(headers["X-Header"])["length"] == len(b"hello server")
+
+def test_binary_payload_with_key(url):
+    payload = bytes(range(256)) * 4
+    status, _, stego_png = _request(url, "POST", "/hide?depth=2&compress=zlib", payload + _png(),
+                                    {"X-Payload-Length": str(len(payload)), "X-Stego-Key": "k"})
+    assert status == 200
+    assert _request(url, "POST", "/extract", stego_png, {"X-Stego-Key": "k"})[2] == payload
+
+def test_errors_are_json(url):
+    assert _request(url, "POST", "/extract", _png())[0] == 404
+    assert _request(url, "POST", "/extract", b"not an image")[0] == 422
+    status, _, body = _request(url, "GET", "/capacity?width=5")
+    assert status == 400 and "error" in json.loads(body)
+    status, _, body = _request(url, "POST", "/hide", b"payload" + _png(), {"X-Payload-Length": "-3"})
+    assert status == 400 and json.loads(body)["error"] == "Malformed X-Payload-Length"
+
+def test_body_over_the_limit_gets_413():
+    with server.BackgroundServer(workers=1, max_body=1000) as url:
+        status, _, body = _request(url, "POST", "/extract", bytes(5000))
+    assert status == 413
+    assert "error" in json.loads(body)
+
+def test_full_queue_gets_429_before_the_body_is_read():
+    with server.BackgroundServer(workers=1, queue_limit=0) as url:
+        address = urlsplit(url)
+        # An upload that has started but not finished holds the only job slot
+        holder = socket.create_connection((address.hostname, address.port))
+        try:
+            holder.sendall(b"POST /extract HTTP/1.1\r\nHost: x\r\nContent-Length: 100000\r\n\r\n" + bytes(100))
+            deadline = time.monotonic() + 10
+            while True:
+                status, headers, _ = _request(url, "POST", "/extract", _png())
+                if status == 429 or time.monotonic() > deadline:
+                    break
+                time.sleep(0.05)  # the holder's headers may not have been read yet
+            assert status == 429
+            assert headers["Retry-After"] == "1"
+        finally:
+            holder.close()
+
+def test_slow_job_gets_504():
+    payload = os.urandom(4 << 20)  # lzma on random data keeps the worker busy past the timeout
+    with server.BackgroundServer(workers=1, timeout=0.2) as url:
+        status, _, body = _request(url, "POST", "/hide?compress=lzma", payload + _png(),
+                                   {"X-Payload-Length": str(len(payload))})
+    assert status == 504
+    assert json.loads(body) == {"error": "Request timed out"}
+
+def test_metrics_use_the_prometheus_text_format(url):
+    _request(url, "GET", "/capacity?width=100&height=100")
+    status, headers, body = _request(url, "GET", "/metrics")
+    assert status == 200
+    assert headers["Content-Type"].startswith("text/plain")
+    text = body.decode()
+    sample = re.compile(r'^[a-z_]+(\{[a-z_]+="[^"]*"(,[a-z_]+="[^"]*")*\})? -?[0-9.e+-]+$')
+    for line in text.splitlines():
+        assert line.startswith("# HELP ") or line.startswith("# TYPE ") or sample.match(line), line
+    assert "# TYPE stego_requests_total counter" in text
+    assert re.search(r'stego_requests_total\{endpoint="/capacity",status="200"\} [1-9]', text)
+    buckets = [int(n) for n in re.findall(r'stego_request_seconds_bucket\{endpoint="/capacity",le="[^"]+"\} (\d+)', text)]
+    count = int(re.search(r'stego_request_seconds_count\{endpoint="/capacity"\} (\d+)', text).group(1))
+    assert buckets == sorted(buckets) and buckets[-1] == count
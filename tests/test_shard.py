@@ -0,0 +1,97 @@
+import json
+import os
+import random
+
+import numpy as np
+import pytest
+from PIL import Image
+
+import stego
+
+def _carriers(root, count, prefix="c", seed=4):
+    rng = np.random.default_rng(seed)
+    paths = []
+    for i in range(count):
+        path = str(root / f"{prefix}{i}.png")
+        Image.fromarray(rng.integers(0, 256, (40, 50, 3), dtype=np.uint8)).save(path)
+        paths.append(path)
+    return paths
+
+def _shard(paths, out_dir, payload, **options):
+    results = stego.hide_sharded(paths, str(out_dir), payload, workers=2, **options)
+    assert all(r.ok for r in results), [r.summary for r in results]
+    return [r.output_path for r in results]
+
+@pytest.fixture
+def payload():
+    return bytes(np.random.default_rng(9).integers(0, 256, 1500, dtype=np.uint8))
+
+def test_shards_reassemble_in_any_order(tmp_path, payload):
+    paths = _carriers(tmp_path, 4)
+    assert len(payload) > stego.capacity(paths[0])
+    outputs = _shard(paths, tmp_path / "out", payload)
+    random.Random(1).shuffle(outputs)
+    report = stego.extract_sharded(outputs, workers=2)
+    assert report.ok, report.summary
+    assert report.payload == payload
+    assert report.count == 4
+    assert sorted(report.shards.values()) == sorted(outputs)
+
+def test_missing_carrier_is_named(tmp_path, payload):
+    outputs = _shard(_carriers(tmp_path, 4), tmp_path / "out", payload)
+    report = stego.extract_sharded(outputs[:2] + outputs[3:], workers=2)
+    assert not report.ok
+    assert report.missing == [os.path.basename(outputs[2])]
+    assert os.path.basename(outputs[2]) in report.error
+
+def test_strays_are_listed_in_errors(tmp_path, payload):
+    outputs = _shard(_carriers(tmp_path, 4), tmp_path / "out", payload)
+    other = _shard(_carriers(tmp_path, 2, prefix="o", seed=5), tmp_path / "other", b"another payload")
+    plain = str(tmp_path / "plain.png")
+    assert stego.hide(_carriers(tmp_path, 1, prefix="p")[0], plain, b"not a shard").ok
+    clean = _carriers(tmp_path, 1, prefix="clean")[0]
+
+    report = stego.extract_sharded(outputs + [other[0], plain, clean], workers=2)
+    assert report.ok, report.summary
+    assert report.payload == payload
+    assert report.errors[other[0]] == "Shard of a different payload"
+    assert report.errors[plain] == "No shard found"
+    assert clean in report.errors
+    assert not set(report.errors) & set(outputs)
+
+def test_carriers_too_small(tmp_path):
+    paths = _carriers(tmp_path, 2)
+    total = sum(stego.capacity(p) for p in paths)
+    with pytest.raises(ValueError, match="Carriers too small"):
+        stego.hide_sharded(paths, str(tmp_path / "out"), bytes(total), workers=1)
+    assert not (tmp_path / "out").exists()
+
+def test_auto_compression_with_a_key(tmp_path):
+    paths = _carriers(tmp_path, 3)
+    text = b"sharded and scattered " * 200  # compresses to well within the carriers
+    assert len(text) > sum(stego.capacity(p) for p in paths)
+    outputs = _shard(paths, tmp_path / "out", text, compress="auto", key="secret")
+    report = stego.extract_sharded(outputs[::-1], key="secret", workers=2)
+    assert report.ok, report.summary
+    assert report.payload == text
+    assert not stego.extract_sharded(outputs, workers=2).ok
+
+def test_shard_and_unshard_commands(tmp_path, capsys, payload):
+    paths = _carriers(tmp_path, 3)
+    payload_file = tmp_path / "payload.bin"
+    payload_file.write_bytes(payload[:1000])
+    out = tmp_path / "out"
+    assert stego.main(["shard", *paths, "--payload-file", str(payload_file), "--out-dir", str(out),
+                       "--workers", "2"]) == 0
+    records = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert [r["status"] for r in records] == ["ok"] * 3
+
+    restored = tmp_path / "restored.bin"
+    assert stego.main(["unshard", str(out), "--out", str(restored), "--workers", "2"]) == 0
+    record = json.loads(capsys.readouterr().out)
+    assert record["shards"] == 3
+    assert restored.read_bytes() == payload[:1000]
+
+    os.remove(out / "c1.png")
+    assert stego.main(["unshard", str(out), "--out", str(restored), "--workers", "2"]) == 1
+    assert json.loads(capsys.readouterr().out)["missing"] == ["c1.png"]
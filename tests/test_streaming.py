@@ -0,0 +1,36 @@
+import os
+
+import numpy as np
+import pytest
+from PIL import Image, PngImagePlugin
+
+import stego
+
+@pytest.fixture
+def png(tmp_path):
+    rng = np.random.default_rng(5)
+    info = PngImagePlugin.PngInfo()
+    info.add_text("Comment", "kept")
+    path = tmp_path / "stream.png"
+    Image.fromarray(rng.integers(0, 256, (300, 200, 3), dtype=np.uint8)).save(
+        path, icc_profile=b"icc", transparency=(1, 2, 3), dpi=(300, 300), pnginfo=info)
+    return str(path)
+
+def test_streaming_round_trip_keeps_ancillary_chunks(png, tmp_path):
+    output = str(tmp_path / "out.png")
+    stats = stego.hide_bytes_streaming(png, output, b"streamed" * 50, strip_rows=16)
+    assert stats["streamed"]
+    assert stego.extract_bytes(output) == b"streamed" * 50
+    with Image.open(output) as img:
+        assert img.info["icc_profile"] == b"icc"
+        assert img.info["transparency"] == (1, 2, 3)
+        assert img.info["Comment"] == "kept"
+        assert round(img.info["dpi"][0]) == 300
+    if stego.resource is not None:
+        # Measured in a fresh process: the interpreter plus this call, not the test run's peak
+        assert 0 < stats["peak_rss_bytes"] < 1 << 30
+
+def test_streaming_failure_leaves_no_output(png, tmp_path):
+    with pytest.raises(ValueError, match="too small"):
+        stego.hide_bytes_streaming(png, str(tmp_path / "out.png"), os.urandom(100_000))
+    assert sorted(os.listdir(tmp_path)) == ["stream.png"]